@@ -4,7 +4,7 @@ from flask_cors import cross_origin
 from flask_cors import CORS
 from conf import conf
 from routers import router
-from controllers import error
+from controllers import compression, error, perfilado
 import logging
 conf.check_env()
 
@@ -24,8 +24,8 @@ cors_config = {
         r"/v1/*": {
             "origins": get_allowed_origins(),
             "methods": ["GET", "POST", "OPTIONS"],
-            "allow_headers": ["Authorization", "Content-Type"],
-            "expose_headers": ["X-Total-Count"],
+            "allow_headers": ["Authorization", "Content-Type", "If-None-Match", "X-Perfilado-Token"],
+            "expose_headers": ["X-Total-Count", "ETag", "Server-Timing", "X-Perfil", "Retry-After"],
             "max_age": 600,
             "supports_credentials": False
         }
@@ -35,6 +35,8 @@ cors_config = {
 CORS(app, **cors_config)
 router.add_routing(app)
 error.add_error_handler(app)
+compression.add_compression(app)
+perfilado.add_perfilado(app)
 
 if __name__ == '__main__':
     
@@ -0,0 +1,142 @@
+"""
+Benchmark de extremo a extremo de /v1/auditoria/buscarLogsFiltrados sin AWS: el cliente de
+CloudWatch se reemplaza por benchmarks.fake_logs y AUTENTICACION_MID / API_TERCEROS_CRUD por
+servidores locales. Reporta latencia p50/p95/p99, peticiones por segundo y pico de memoria (RSS).
+
+Uso:
+    python -m benchmarks.bench_e2e [--peticiones 40] [--concurrencia 4] [--eventos 20000] ...
+"""
+import argparse
+import math
+import os
+import resource
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("API_PORT", "8080")
+os.environ.setdefault("ENV", "dev")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from benchmarks import servidores_stub
+from benchmarks.fake_logs import FakeLogsClient
+
+# El controlador interpreta fechaInicio/fechaFin en la zona del servidor y el servicio en la de
+# Bogotá; se deja margen para que la ventana consultada quede dentro de los eventos falsos
+MARGEN_ZONA = 6 * 3600
+
+
+def argumentos():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--peticiones", type=int, default=40, help="peticiones por modo")
+    parser.add_argument("--concurrencia", type=int, default=4)
+    parser.add_argument("--eventos", type=int, default=20000, help="eventos del grupo de logs falso")
+    parser.add_argument("--limite", type=int, default=100, help="registros por página")
+    parser.add_argument("--latencia-aws", type=float, default=0.02, help="segundos por llamada a CloudWatch")
+    parser.add_argument("--duracion-consulta", type=float, default=0.5, help="segundos hasta que Insights completa")
+    parser.add_argument("--latencia-http", type=float, default=0.01, help="segundos por llamada a las APIs de usuarios")
+    parser.add_argument("--modos", default="standard,flexible")
+    parser.add_argument("--particionada", action="store_true", help="modoConsulta particionada")
+    parser.add_argument("--insights", action="store_true", help="modoParseo insights")
+    parser.add_argument("--ndjson", action="store_true", help="respuestas en streaming ndjson")
+    parser.add_argument("--sin-cache", action="store_true", help="vacía las cachés antes de cada petición")
+    return parser.parse_args()
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def pico_rss_mb():
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def vaciar_caches():
+    from services import cache, snapshots
+    cache.cache_consultas.clear()
+    cache.cache_roles.clear()
+    cache.cache_nombres.clear()
+    snapshots._snapshots.clear()
+
+
+def cuerpo(args, fake, modo, pagina):
+    body = {
+        "nombreApi": "polux_crud",
+        "entornoApi": "SANDBOX",
+        "fechaInicio": str(fake.inicio),
+        "horaInicio": "00:00",
+        "fechaFin": str(fake.fin - MARGEN_ZONA),
+        "horaFin": "00:00",
+        "typeSearch": modo,
+        "pagina": pagina,
+        "limite": args.limite,
+        "tipo_log": "",
+        "codigoResponsable": "",
+    }
+    if args.particionada:
+        body["modoConsulta"] = "particionada"
+    if args.insights:
+        body["modoParseo"] = "insights"
+    if args.ndjson:
+        body["formato"] = "ndjson"
+    return body
+
+
+def ejecutar_modo(app, args, fake, modo):
+    latencias = []
+    errores = 0
+
+    def peticion(i):
+        if args.sin_cache:
+            vaciar_caches()
+        cliente = app.test_client()
+        inicio = time.perf_counter()
+        response = cliente.post("/v1/auditoria/buscarLogsFiltrados", json=cuerpo(args, fake, modo, 1 + i % 5))
+        response.get_data()
+        return time.perf_counter() - inicio, response.status_code
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrencia) as executor:
+        for latencia, status in executor.map(peticion, range(args.peticiones)):
+            latencias.append(latencia)
+            errores += status != 200
+    total = time.perf_counter() - inicio
+    return {
+        "modo": modo,
+        "errores": errores,
+        "p50": percentil(latencias, 50) * 1000,
+        "p95": percentil(latencias, 95) * 1000,
+        "p99": percentil(latencias, 99) * 1000,
+        "rps": args.peticiones / total,
+    }
+
+
+def main():
+    args = argumentos()
+    url, servidor = servidores_stub.iniciar(args.latencia_http)
+    os.environ["AUTENTICACION_MID"] = url
+    os.environ["API_TERCEROS_CRUD"] = url
+
+    import api
+    from services import auditoriaService, auditoriaServiceLog
+
+    fake = FakeLogsClient(args.eventos, latencia=args.latencia_aws, duracion=args.duracion_consulta)
+    auditoriaService.client = fake
+    auditoriaServiceLog.client = fake
+
+    print(f"eventos: {args.eventos}  peticiones por modo: {args.peticiones}  concurrencia: {args.concurrencia}")
+    print(f"{'modo':<10}{'errores':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'RSS MB':>10}")
+    try:
+        for modo in args.modos.split(","):
+            resultado = ejecutar_modo(api.app, args, fake, modo)
+            print(f"{resultado['modo']:<10}{resultado['errores']:>8}{resultado['p50']:>10.1f}"
+                  f"{resultado['p95']:>10.1f}{resultado['p99']:>10.1f}{resultado['rps']:>10.1f}"
+                  f"{pico_rss_mb():>10.1f}")
+    finally:
+        servidor.shutdown()
+    print(f"llamadas a CloudWatch: {fake.llamadas}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Microbenchmarks de las funciones que se ejecutan por cada log de una página: operaciones por
+segundo y bytes asignados (pico por llamada, con tracemalloc). Los resultados se pueden guardar
+como línea base y comparar contra ella para ver el efecto de un cambio antes de desplegarlo.
+
+Uso:
+    python -m benchmarks.bench_funciones [--lineas 5000] [--perfil sql_largo]
+    python -m benchmarks.bench_funciones --guardar base.json
+    python -m benchmarks.bench_funciones --comparar base.json [--umbral 10]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from benchmarks.corpus import PERFILES, generar_corpus
+from services import auditoriaService, parserLog
+
+
+def casos(lineas):
+    """Argumentos reales de cada función, obtenidos del corpus como lo hace procesar_logs"""
+    resultado = {nombre: [] for nombre in FUNCIONES}
+    for linea in lineas:
+        datos = parserLog.extract_log_data(linea)
+        metodo = datos.get("metodo", "")
+        sql_orm = datos.get("sql_orm")
+        resultado["extract_log_data"].append((linea,))
+        resultado["extraer_error"].append((datos["mensaje"],))
+        resultado["convert_fecha"].append((datos.get("fecha", ""),))
+        resultado["extract_log_json"].append(
+            (datos.get("endpoint"), datos.get("api"), metodo, datos.get("usuario"), datos.get("data"))
+        )
+        if len(linea) <= auditoriaService.MAX_TEXT_LENGTH:
+            resultado["limpiar_caracteres_ansi"].append((linea,))
+        if sql_orm:
+            resultado["reemplazar_valores_log"].append((metodo, sql_orm))
+            coincidencia = auditoriaService.PATRON.search(sql_orm)
+            if coincidencia:
+                valores = auditoriaService._extract_values(metodo.upper(), coincidencia.group(2))
+                resultado["_replace_placeholders"].append((coincidencia.group(1), valores))
+    return resultado
+
+
+FUNCIONES = {
+    "extract_log_data": parserLog.extract_log_data,
+    "reemplazar_valores_log": auditoriaService.reemplazar_valores_log,
+    "_replace_placeholders": auditoriaService._replace_placeholders,
+    "extraer_error": auditoriaService.extraer_error,
+    "limpiar_caracteres_ansi": auditoriaService.limpiar_caracteres_ansi,
+    "convert_fecha": auditoriaService.convert_fecha,
+    "extract_log_json": auditoriaService.extract_log_json,
+}
+
+
+def medir_velocidad(funcion, argumentos, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for args in argumentos:
+            funcion(*args)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return len(argumentos) / mejor
+
+
+def medir_asignaciones(funcion, argumentos):
+    """Promedio de bytes pico asignados durante cada llamada"""
+    total = 0
+    tracemalloc.start()
+    try:
+        for args in argumentos:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            funcion(*args)
+            total += tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    return total / len(argumentos)
+
+
+def ejecutar(args):
+    lineas = generar_corpus(args.lineas, perfil=args.perfil)
+    entradas = casos(lineas)
+    resultados = {}
+    for nombre, funcion in FUNCIONES.items():
+        if args.funcion and nombre not in args.funcion:
+            continue
+        argumentos = entradas[nombre]
+        if not argumentos:
+            continue
+        resultados[nombre] = {
+            "ops": medir_velocidad(funcion, argumentos, args.repeticiones),
+            "bytes": medir_asignaciones(funcion, argumentos),
+            "casos": len(argumentos),
+        }
+    return resultados
+
+
+def imprimir(resultados, base=None, umbral=10.0):
+    """Imprime la tabla; con línea base retorna las funciones más lentas que el umbral (%)"""
+    regresiones = []
+    encabezado = f"{'función':<26}{'casos':>8}{'ops/s':>14}{'bytes/op':>12}"
+    if base:
+        encabezado += f"{'Δ ops':>10}{'Δ bytes':>10}"
+    print(encabezado)
+    for nombre, medida in resultados.items():
+        fila = f"{nombre:<26}{medida['casos']:>8}{medida['ops']:>14,.0f}{medida['bytes']:>12,.0f}"
+        anterior = (base or {}).get(nombre)
+        if anterior:
+            delta_ops = (medida["ops"] / anterior["ops"] - 1) * 100
+            delta_bytes = (medida["bytes"] / anterior["bytes"] - 1) * 100 if anterior["bytes"] else 0.0
+            fila += f"{delta_ops:>+9.1f}%{delta_bytes:>+9.1f}%"
+            if delta_ops < -umbral:
+                regresiones.append(nombre)
+                fila += "  <- regresión"
+        print(fila)
+    return regresiones
+
+
+def argumentos():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lineas", type=int, default=5000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--perfil", choices=sorted(PERFILES), help="solo líneas de este tipo (por defecto mezcla)")
+    parser.add_argument("--funcion", action="append", choices=sorted(FUNCIONES), help="repetible")
+    parser.add_argument("--guardar", metavar="ARCHIVO", help="guarda los resultados como línea base")
+    parser.add_argument("--comparar", metavar="ARCHIVO", help="compara contra una línea base guardada")
+    parser.add_argument("--umbral", type=float, default=10.0, help="%% de caída de ops/s que cuenta como regresión")
+    return parser.parse_args()
+
+
+def main():
+    args = argumentos()
+    base = None
+    if args.comparar:
+        with open(args.comparar) as archivo:
+            guardado = json.load(archivo)
+        base = guardado["resultados"]
+        if (guardado.get("lineas"), guardado.get("perfil")) != (args.lineas, args.perfil):
+            print(f"aviso: la línea base se midió con lineas={guardado.get('lineas')} perfil={guardado.get('perfil')}")
+
+    print(f"lineas: {args.lineas}  perfil: {args.perfil or 'mezcla'}  python: {platform.python_version()}")
+    resultados = ejecutar(args)
+    regresiones = imprimir(resultados, base, args.umbral)
+
+    if args.guardar:
+        with open(args.guardar, "w") as archivo:
+            json.dump({
+                "lineas": args.lineas,
+                "perfil": args.perfil,
+                "python": platform.python_version(),
+                "fecha": int(time.time()),
+                "resultados": resultados,
+            }, archivo, indent=2)
+        print(f"línea base guardada en {args.guardar}")
+    if regresiones:
+        print(f"regresiones (> {args.umbral}% menos ops/s): {', '.join(regresiones)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compara los backends de serialización de services/jsonResponse sobre páginas de RespuestaLog
+con la forma de las respuestas reales (Status, Code, Data, Pagination).
+
+Uso:
+    python -m benchmarks.bench_json [cantidad_registros]
+"""
+import importlib.util
+import json
+import sys
+import time
+
+from benchmarks.bench_respuesta_log import argumentos
+from benchmarks.corpus import generar_corpus
+from models.respuesta_log import RespuestaLog
+from services import jsonResponse
+
+
+def payload(cantidad):
+    registros = [RespuestaLog(**registro).to_vars() for registro in argumentos(generar_corpus(cantidad))]
+    return {
+        "Status": "Successful request",
+        "Code": "200",
+        "Data": registros,
+        "Pagination": {"pagina": 1, "limite": cantidad, "total registros": cantidad, "paginas": 1},
+    }
+
+
+def codificadores():
+    """Nombre -> función obj -> bytes; "anterior" es el json.dumps por defecto que usaban las respuestas"""
+    resultado = {
+        "anterior": lambda obj: json.dumps(obj).encode("utf-8"),
+        "json": jsonResponse._cargar_backend("json")[1],
+    }
+    for nombre in ("orjson", "ujson"):
+        if importlib.util.find_spec(nombre):
+            resultado[nombre] = jsonResponse._cargar_backend(nombre)[1]
+    return resultado
+
+
+def medir(funcion, repeticiones=5):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        salida = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, salida
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    datos = payload(cantidad)
+    referencia = json.loads(json.dumps(datos))
+    print(f"registros: {cantidad}  backend configurado: {jsonResponse.backend}")
+    print(f"{'codificador':<14}{'ms':>10}{'registros/s':>14}{'bytes':>14}{'ms streaming':>14}")
+    for nombre, dumps in codificadores().items():
+        segundos, cuerpo = medir(lambda: dumps(datos))
+        assert json.loads(cuerpo) == referencia, f"{nombre} no produce el mismo JSON"
+        encabezado = {"Status": datos["Status"], "Code": datos["Code"]}
+
+        def streaming():
+            jsonResponse.dumps, anterior = dumps, jsonResponse.dumps
+            try:
+                return b"".join(jsonResponse.iter_json_objeto(
+                    encabezado, "Data", datos["Data"], lambda: {"Pagination": datos["Pagination"]}
+                ))
+            finally:
+                jsonResponse.dumps = anterior
+        segundos_stream, cuerpo_stream = medir(streaming)
+        assert json.loads(cuerpo_stream) == referencia
+        print(f"{nombre:<14}{segundos * 1000:>10.1f}{cantidad / segundos:>14,.0f}"
+              f"{len(cuerpo):>14,}{segundos_stream * 1000:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Compara el parser de una sola pasada (services/parserLog) con la implementación anterior
+basada en 11 búsquedas con expresiones sin compilar más la limpieza ANSI repetida.
+
+Uso:
+    python -m benchmarks.bench_parser [cantidad_lineas] [repeticiones]
+"""
+import json
+import re
+import sys
+import time
+
+from benchmarks.corpus import generar_corpus
+from services import parserLog
+
+ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
+
+def extract_log_data_anterior(log_entry):
+    """Implementación anterior de extract_log_data, conservada como referencia"""
+    patterns = {
+        "apiConsumen": r"app_name:\s([^\s,]+)",
+        "api": r"host:\s([^\s,]+)",
+        "endpoint": r"end_point:\s([^\s,]+)",
+        "metodo": r"method:\s([^\s,]+)",
+        "fecha": r"date:\s([^\s,]+)",
+        "direccionAccion": r"ip_user:\s([^\s,]+)",
+        "user_agent": r"user_agent:\s([^\s,]+)",
+        "usuario": r"\b, user:\s([^\s,]+)",
+        "data": r"data:\s({.*})",
+        "tipo_log": r"\[([a-zA-Z0-9\._-]+)(?=\.\w+:)",
+        "sql_orm": r"sql_orm:\s\{(.*?)\},\s+ip_user:",
+    }
+    extracted_data = {}
+    clean_log = re.sub(r"\x1b\[[0-9;]*m", "", log_entry)
+    for key, pattern in patterns.items():
+        match = re.search(pattern, clean_log)
+        if match:
+            value = match.group(1)
+            if key == "data":
+                try:
+                    extracted_data[key] = json.loads(value)
+                except json.JSONDecodeError:
+                    extracted_data[key] = value
+            else:
+                extracted_data[key] = value
+    return extracted_data
+
+
+def anterior(linea):
+    # El flujo anterior además limpiaba ANSI otra vez para mensaje_error
+    datos = extract_log_data_anterior(linea)
+    datos["mensaje"] = ANSI_ESCAPE.sub("", linea)
+    return datos
+
+
+def medir(funcion, lineas, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for linea in lineas:
+            funcion(linea)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return len(lineas) / mejor
+
+
+def verificar(lineas):
+    """Ambas implementaciones deben extraer los mismos campos"""
+    for linea in lineas:
+        esperado = anterior(linea)
+        obtenido = parserLog.extract_log_data(linea)
+        for llave, valor in esperado.items():
+            if obtenido.get(llave) != valor:
+                raise AssertionError(f"Diferencia en {llave}: {valor!r} != {obtenido.get(llave)!r}")
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    lineas = generar_corpus(cantidad)
+    verificar(lineas)
+
+    lps_anterior = medir(anterior, lineas, repeticiones)
+    lps_nuevo = medir(parserLog.extract_log_data, lineas, repeticiones)
+    print(f"lineas: {cantidad}, repeticiones: {repeticiones} (mejor tiempo)")
+    print(f"{'implementación':<28}{'lineas/s':>14}")
+    print(f"{'anterior (11 re.search)':<28}{lps_anterior:>14,.0f}")
+    print(f"{'parserLog (una pasada)':<28}{lps_nuevo:>14,.0f}")
+    print(f"aceleración: {lps_nuevo / lps_anterior:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
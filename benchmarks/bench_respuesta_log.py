@@ -0,0 +1,148 @@
+"""
+Compara memoria y tiempo de serialización de RespuestaLog (slots + cadenas internadas)
+contra la versión anterior con __dict__ por instancia.
+
+Uso:
+    python -m benchmarks.bench_respuesta_log [cantidad_registros]
+
+Referencia (10000 registros, Python 3.11, orjson):
+
+    modelo          bytes/registro   creados/s   to_vars/s   respuesta/s
+    anterior                 1,882     304,858   4,419,382       167,743
+    slots+intern             1,723     453,788     872,057       163,098
+
+to_vars/s no es comparable (vars() no copia); la columna que importa es respuesta/s, donde
+codificar el JSON domina. dict(zip(CAMPOS, attrgetter(*CAMPOS)(objeto))) resultó unas 3 veces
+más lento que el diccionario literal de to_vars.
+"""
+import gc
+import sys
+import time
+import tracemalloc
+
+from benchmarks.corpus import generar_corpus
+from models.respuesta_log import RespuestaLog
+from services import jsonResponse, parserLog
+
+
+class RespuestaLogAnterior:
+    """Versión anterior del modelo, conservada como referencia"""
+    def __init__(self, **kwargs):
+        self.tipo_log = kwargs.get('tipo_log')
+        self.fecha = kwargs.get('fecha')
+        self.rol_responsable = kwargs.get('rol_responsable')
+        self.nombre_responsable = kwargs.get('nombre_responsable')
+        self.documento_responsable = kwargs.get('documento_responsable')
+        self.direccion_accion = kwargs.get('direccion_accion')
+        self.rol = kwargs.get('rol')
+        self.apis_consumen = kwargs.get('apis_consumen')
+        self.peticion_realizada = kwargs.get('peticion_realizada')
+        self.evento_bd = kwargs.get('evento_bd')
+        self.tipo_error = kwargs.get('tipo_error')
+        self.mensaje_error = kwargs.get('mensaje_error')
+
+    def to_vars(self):
+        return vars(self)
+
+
+def argumentos(lineas):
+    """
+    Valores con la forma de los que produce procesar_logs: cada campo del parser es una cadena
+    nueva; nombre, documento y rol se comparten por usuario, como los asigna enriquecer_eventos.
+    """
+    registros = []
+    usuarios = {}
+    for linea in lineas:
+        datos = parserLog.extract_log_data(linea)
+        usuario = datos.get("usuario", "N/A")
+        if usuario not in usuarios:
+            usuarios[usuario] = (
+                "".join(f"Nombre de {usuario}"),
+                str(hash(usuario) % 10 ** 8),
+                "".join("ADMINISTRADOR_SGA, DOCENTE"),
+            )
+        nombre, documento, rol = usuarios[usuario]
+        registros.append({
+            "tipo_log": "".join(datos.get("tipo_log", "N/A")),
+            "fecha": datos.get("fecha"),
+            "rol_responsable": f"{usuario}@udistrital.edu.co",
+            "nombre_responsable": nombre,
+            "documento_responsable": documento,
+            "direccion_accion": "".join(datos.get("direccionAccion", "N/A")),
+            "rol": rol,
+            "apis_consumen": "".join(datos.get("apiConsumen", "N/A")),
+            "peticion_realizada": datos.get("endpoint"),
+            "evento_bd": datos.get("sql_orm"),
+            "tipo_error": "".join("N/A"),
+            "mensaje_error": datos["mensaje"],
+        })
+    return registros
+
+
+def medir_memoria(clase, lineas):
+    """Memoria retenida por los objetos y sus cadenas, creadas dentro de la medición"""
+    gc.collect()
+    tracemalloc.start()
+    objetos = [clase(**registro) for registro in argumentos(lineas)]
+    gc.collect()
+    actual, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return objetos, actual, pico
+
+
+def medir_construccion(clase, registros, repeticiones=5):
+    """Objetos creados por segundo con los mismos argumentos"""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for registro in registros:
+            clase(**registro)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return len(registros) / mejor
+
+
+def medir_serializacion(objetos, repeticiones=5):
+    """vars() del modelo anterior no copia (retorna el __dict__ de la instancia); to_vars sí construye un dict"""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for objeto in objetos:
+            objeto.to_vars()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return len(objetos) / mejor
+
+
+def medir_respuesta(objetos, repeticiones=5):
+    """Registros por segundo de la ruta completa de una página: diccionario más jsonResponse.dumps"""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        jsonResponse.dumps([objeto.to_vars() for objeto in objetos])
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return len(objetos) / mejor
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    lineas = generar_corpus(cantidad)
+    print(f"registros: {cantidad}")
+    registros = argumentos(lineas)
+    print(f"backend json: {jsonResponse.backend}")
+    print(
+        f"{'modelo':<16}{'bytes retenidos':>18}{'bytes/registro':>16}{'pico':>14}"
+        f"{'creados/s':>14}{'to_vars/s':>14}{'respuesta/s':>14}"
+    )
+    for nombre, clase in (("anterior", RespuestaLogAnterior), ("slots+intern", RespuestaLog)):
+        objetos, actual, pico = medir_memoria(clase, lineas)
+        construccion = medir_construccion(clase, registros)
+        velocidad = medir_serializacion(objetos)
+        respuesta = medir_respuesta(objetos)
+        print(
+            f"{nombre:<16}{actual:>18,}{actual // cantidad:>16,}{pico:>14,}"
+            f"{construccion:>14,.0f}{velocidad:>14,.0f}{respuesta:>14,.0f}"
+        )
+        del objetos
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Generador de líneas sintéticas de middleware.go de beego con la forma de los logs reales
+de los APIs CRUD, para medir el procesamiento sin depender de CloudWatch.
+"""
+import json
+import random
+
+APIS = ["polux_crud", "terceros_crud", "sga_mid", "resoluciones_crud", "oikos_api"]
+METODOS = ["GET", "GET", "GET", "POST", "PUT", "DELETE"]
+USUARIOS = ["jperez", "mgomez", "lrodriguez", "Error WSO2", "N/A", "admin_sga", "cmartinez"]
+AGENTES = ["ELB-HealthChecker/2.0", "Mozilla/5.0", "axios/1.6.2", "Go-http-client/1.1"]
+COLOR_NIVEL = "\x1b[1;44m[I]\x1b[0m"
+
+
+def _sql_orm(rng, metodo, columnas):
+    campos = ", ".join(f"\"campo_{i}\"" for i in range(columnas))
+    marcadores = ", ".join(f"${i + 1}" for i in range(columnas))
+    if metodo == "POST":
+        valores = ", ".join(f"valor_{rng.randint(0, 999)}" for _ in range(columnas))
+        return f"[INSERT INTO \"tabla\" ({campos}) VALUES ({marcadores})] - {valores}"
+    valores = " ".join(f"`{rng.randint(0, 99999)}`" for _ in range(columnas))
+    if metodo == "PUT":
+        asignaciones = ", ".join(f"\"campo_{i}\" = ${i + 1}" for i in range(columnas))
+        return f"[UPDATE \"tabla\" SET {asignaciones} WHERE \"id\" = ${columnas}] - {valores}"
+    return f"[SELECT {campos} FROM \"tabla\" WHERE \"id\" = $1 LIMIT {columnas}] - {valores}"
+
+
+def _data(rng, tamano, error):
+    cuerpo = {"RouterPattern": "/v1/tabla/:id", "json": {"Success": not error, "Status": "500" if error else "200"}}
+    if error:
+        cuerpo["json"]["Data"] = "pq: duplicate key value violates unique constraint"
+        cuerpo["json"]["Message"] = "Error service Post: The request contains an incorrect data type or an invalid parameter"
+    else:
+        cuerpo["json"]["Data"] = [{"Id": i, "Nombre": f"registro {i}", "Activo": True} for i in range(tamano)]
+    return json.dumps(cuerpo)
+
+
+def generar_linea(rng, columnas_sql=6, registros_data=3, ansi=True, error=False):
+    """Una línea de log; `columnas_sql` y `registros_data` controlan el largo de sql_orm y data"""
+    metodo = rng.choice(METODOS)
+    app = rng.choice(APIS)
+    segundo = rng.randint(0, 59)
+    nivel = COLOR_NIVEL if ansi else "[I]"
+    return (
+        f"2025/07/01 12:00:{segundo:02d}.{rng.randint(0, 999):03d} {nivel} [middleware.go:163] "
+        f"{{app_name: {app}, host: 10.20.{rng.randint(0, 9)}.{rng.randint(1, 254)}:8080, "
+        f"end_point: /v1/tabla/{rng.randint(1, 5000)}, method: {metodo}, "
+        f"date: 2025-07-01T12:00:{segundo:02d}Z, sql_orm: {{{_sql_orm(rng, metodo, columnas_sql)}}}, "
+        f"ip_user: 172.16.{rng.randint(0, 9)}.{rng.randint(1, 254)}, user_agent: {rng.choice(AGENTES)}, "
+        f"user: {rng.choice(USUARIOS)}, data: {_data(rng, registros_data, error)}}}"
+    )
+
+
+# Argumentos de generar_linea para cada tipo de línea
+PERFILES = {
+    "corto": {},
+    "sql_largo": {"columnas_sql": 60},
+    "data_grande": {"registros_data": 60, "ansi": False},
+    "error": {"error": True},
+    "sql_enorme": {"columnas_sql": 400},
+    "data_enorme": {"registros_data": 400},
+    "sin_ansi": {"ansi": False},
+}
+# Proporción de cada perfil en el corpus mixto (de cada 10 líneas)
+MEZCLA = ["corto"] * 5 + ["sql_largo"] * 2 + ["data_grande"] * 2 + ["error"]
+
+
+def generar_corpus(cantidad=10000, semilla=42, perfil=None):
+    """
+    Mezcla de líneas cortas, con sql_orm largo, con data grande, con errores y con o sin ANSI.
+    Con `perfil` (llave de PERFILES) todas las líneas son de ese tipo.
+    """
+    rng = random.Random(semilla)
+    if perfil is not None:
+        return [generar_linea(rng, **PERFILES[perfil]) for _ in range(cantidad)]
+    return [generar_linea(rng, **PERFILES[MEZCLA[i % len(MEZCLA)]]) for i in range(cantidad)]
+
+
+def filas_insights(lineas):
+    """Convierte líneas en filas con el formato de `get_query_results`"""
+    return [
+        [
+            {"field": "@timestamp", "value": f"2025-07-01 12:00:00.{i % 1000:03d}"},
+            {"field": "@message", "value": linea},
+            {"field": "@ptr", "value": f"ptr-{i}"},
+        ]
+        for i, linea in enumerate(lineas)
+    ]
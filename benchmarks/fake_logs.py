@@ -0,0 +1,187 @@
+"""
+Cliente falso de CloudWatch Logs para medir el servicio sin AWS.
+Implementa start_query, get_query_results, stop_query y filter_log_events sobre líneas sintéticas
+de middleware.go (benchmarks/corpus) repartidas uniformemente en un rango de tiempo, con latencia
+por llamada y duración de consulta configurables.
+
+Las cláusulas `filter` de la query no se evalúan: cada consulta retorna todos los eventos de su rango
+(hasta el `| limit`). Si la query trae cláusulas `parse` (y no las oculta con `display`) se agregan
+los campos ya separados, como lo hace Insights.
+"""
+import bisect
+import itertools
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+from benchmarks.corpus import generar_corpus
+from services import parserLog
+
+LIMITE_QUERY = re.compile(r"\|\s*limit\s+(\d+)")
+MAX_FILAS_INSIGHTS = 10000
+
+
+class _Consulta:
+    def __init__(self, inicio, fin, limite, parse):
+        self.creada = time.monotonic()
+        self.inicio = inicio
+        self.fin = fin
+        self.limite = limite
+        self.parse = parse
+        self.estado = None
+
+
+class FakeLogsClient:
+    """
+    Parameters
+    ----------
+    cantidad : int
+        Eventos del grupo de logs.
+    inicio, fin : int
+        Rango (epoch en segundos) en el que se reparten los eventos.
+    latencia : float
+        Segundos que tarda cada llamada (ida y vuelta a la API).
+    duracion : float
+        Segundos que tarda una consulta de Insights en completarse; mientras corre
+        get_query_results entrega resultados parciales proporcionales al tiempo transcurrido.
+    max_concurrentes : int
+        Consultas simultáneas permitidas antes de LimitExceededException (0 sin límite).
+    """
+    def __init__(self, cantidad=20000, inicio=None, fin=None, latencia=0.0, duracion=0.0,
+                 max_concurrentes=0, semilla=42):
+        self.fin = fin if fin is not None else int(time.time()) - 3600
+        self.inicio = inicio if inicio is not None else self.fin - 86400
+        self.latencia = latencia
+        self.duracion = duracion
+        self.max_concurrentes = max_concurrentes
+        lineas = generar_corpus(cantidad, semilla)
+        paso = (self.fin - self.inicio) * 1000 / max(1, cantidad)
+        self.timestamps = [int(self.inicio * 1000 + i * paso) for i in range(cantidad)]
+        self.lineas = lineas
+        self.bytes_acumulados = list(itertools.accumulate((len(linea) for linea in lineas), initial=0))
+        self._campos = {}
+        self._consultas = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.llamadas = {"start_query": 0, "get_query_results": 0, "stop_query": 0, "filter_log_events": 0}
+
+    def _llamada(self, nombre):
+        with self._lock:
+            self.llamadas[nombre] += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def _rango(self, inicio_ms, fin_ms):
+        """Índices [desde, hasta) de los eventos con timestamp dentro del rango (extremos inclusivos)"""
+        return bisect.bisect_left(self.timestamps, inicio_ms), bisect.bisect_right(self.timestamps, fin_ms)
+
+    def _fila(self, indice, parse):
+        timestamp = datetime.fromtimestamp(self.timestamps[indice] / 1000, timezone.utc)
+        fila = [
+            {"field": "@timestamp", "value": timestamp.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]},
+            {"field": "@message", "value": self.lineas[indice]},
+            {"field": "@ptr", "value": f"ptr-{indice}"},
+        ]
+        if parse:
+            campos = self._campos.get(indice)
+            if campos is None:
+                campos = self._campos[indice] = _campos_insights(self.lineas[indice])
+            fila.extend({"field": campo, "value": valor} for campo, valor in campos.items())
+        return fila
+
+    def start_query(self, logGroupName, startTime, endTime, queryString, **kwargs):
+        self._llamada("start_query")
+        with self._lock:
+            activas = sum(1 for consulta in self._consultas.values() if consulta.estado is None)
+            if self.max_concurrentes and activas >= self.max_concurrentes:
+                raise ClientError(
+                    {"Error": {"Code": "LimitExceededException", "Message": "Too many concurrent queries"}},
+                    "StartQuery",
+                )
+            limite = LIMITE_QUERY.search(queryString)
+            query_id = f"fake-{next(self._ids)}"
+            self._consultas[query_id] = _Consulta(
+                startTime * 1000,
+                endTime * 1000 + 999,
+                min(int(limite.group(1)) if limite else MAX_FILAS_INSIGHTS, MAX_FILAS_INSIGHTS),
+                "| parse" in queryString and "| display" not in queryString,
+            )
+        return {"queryId": query_id}
+
+    def get_query_results(self, queryId):
+        self._llamada("get_query_results")
+        consulta = self._consultas[queryId]
+        desde, hasta = self._rango(consulta.inicio, consulta.fin)
+        avance = 1.0
+        if consulta.estado is None and self.duracion:
+            avance = min(1.0, (time.monotonic() - consulta.creada) / self.duracion)
+        if consulta.estado is None and avance >= 1.0:
+            consulta.estado = "Complete"
+        # Insights recorre el rango y entrega los más recientes primero
+        escaneados = int((hasta - desde) * avance)
+        indices = range(hasta - 1, hasta - 1 - min(escaneados, consulta.limite), -1)
+        return {
+            "status": consulta.estado or "Running",
+            "results": [self._fila(indice, consulta.parse) for indice in indices],
+            "statistics": {
+                "recordsMatched": float(escaneados),
+                "recordsScanned": float(escaneados),
+                "bytesScanned": float(self.bytes_acumulados[hasta] - self.bytes_acumulados[hasta - escaneados]),
+            },
+        }
+
+    def stop_query(self, queryId):
+        self._llamada("stop_query")
+        consulta = self._consultas.get(queryId)
+        if consulta is None or consulta.estado is not None:
+            raise ClientError(
+                {"Error": {"Code": "InvalidParameterException", "Message": "Query is not running"}},
+                "StopQuery",
+            )
+        consulta.estado = "Cancelled"
+        return {"success": True}
+
+    def filter_log_events(self, logGroupName, startTime=None, endTime=None, limit=10000,
+                          nextToken=None, filterPattern=None, **kwargs):
+        self._llamada("filter_log_events")
+        desde, hasta = self._rango(startTime or 0, endTime if endTime is not None else self.timestamps[-1])
+        desde = int(nextToken) if nextToken else desde
+        fin = min(hasta, desde + min(limit, 10000))
+        eventos = [
+            {"timestamp": self.timestamps[i], "message": self.lineas[i], "logStreamName": "ecs/fake"}
+            for i in range(desde, fin)
+            if not filterPattern or filterPattern in self.lineas[i]
+        ]
+        response = {"events": eventos}
+        if fin < hasta:
+            response["nextToken"] = str(fin)
+        return response
+
+    def consultas_activas(self):
+        with self._lock:
+            return sum(1 for consulta in self._consultas.values() if consulta.estado is None)
+
+
+def _compilar_clausulas():
+    """Traduce las cláusulas `parse @message /regex/` de parserLog a expresiones de Python"""
+    expresiones = []
+    for clausula in parserLog.CLAUSULAS_PARSE_INSIGHTS:
+        patron = clausula.split("/", 1)[1].rsplit("/", 1)[0]
+        expresiones.append(re.compile(patron.replace("(?<", "(?P<")))
+    return expresiones
+
+
+CLAUSULAS_PARSE = _compilar_clausulas()
+
+
+def _campos_insights(linea):
+    """Campos que extraerían las cláusulas parserLog.CLAUSULAS_PARSE_INSIGHTS en Insights"""
+    campos = {}
+    for expresion in CLAUSULAS_PARSE:
+        coincidencia = expresion.search(linea)
+        if coincidencia:
+            campos.update(coincidencia.groupdict())
+    return campos
@@ -0,0 +1,67 @@
+"""
+Servidores HTTP locales que reemplazan a AUTENTICACION_MID (roles del usuario) y a
+API_TERCEROS_CRUD (nombre por documento) durante los benchmarks.
+"""
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _documento(usuario):
+    return str(10 ** 9 + zlib.crc32(usuario.encode()) % 10 ** 8)
+
+
+def _manejador(latencia):
+    class Manejador(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _responder(self, status, cuerpo):
+            if latencia:
+                time.sleep(latencia)
+            datos = json.dumps(cuerpo).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def do_POST(self):
+            longitud = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(longitud) or b"{}")
+            if self.path != "/v1/token/userRol":
+                return self._responder(404, {})
+            usuario = payload.get("user", "")
+            if usuario.startswith("N/A"):
+                return self._responder(400, {"System": {"Error": "Usuario no registrado"}})
+            self._responder(200, {
+                "role": ["Internal/everyone", "ADMINISTRADOR_SGA", "DOCENTE"],
+                "documento": _documento(usuario),
+            })
+
+        def do_GET(self):
+            if not self.path.startswith("/v1/datos_identificacion"):
+                return self._responder(404, {})
+            documento = self.path.rsplit(":", 1)[-1]
+            self._responder(200, [{"TerceroId": {"NombreCompleto": f"Usuario {documento}"}}])
+
+        def log_message(self, format, *args):
+            pass
+
+    return Manejador
+
+
+def iniciar(latencia=0.0):
+    """
+    Levanta un servidor en un puerto libre de 127.0.0.1 que atiende ambas APIs.
+
+    Returns
+    -------
+    tuple
+        (url base, servidor); llamar servidor.shutdown() al terminar.
+    """
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _manejador(latencia))
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name="stub-http", daemon=True).start()
+    return f"http://127.0.0.1:{servidor.server_address[1]}", servidor
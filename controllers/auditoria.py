@@ -1,12 +1,14 @@
-from services import auditoriaService, auditoriaServiceLog
-from flask import json
-from flask import Response
+from services import auditoriaService, auditoriaServiceLog, jsonResponse
 from datetime import datetime
+import hashlib
+import select
+import socket
+from werkzeug.http import parse_etags
 
 STATUS_BAD_REQUEST = "Bad Request"
 STATUS_INTERNAL_ERROR = 'Internal Error'
 STATUS_SUCCESS = "Successful request"
-MIMETYPE = 'application/json'
+MIMETYPE_NDJSON = 'application/x-ndjson'
 
 def get_all(data):
     """
@@ -14,15 +16,16 @@ def get_all(data):
 
         Parameters
         ----------
-        ninguno
+        data : MultiDict
+            log_group_name (o nombreApi y entornoApi), startTime, endTime, filterPattern, particiones y limite
 
         Returns
         -------
         json : lista de eventos de logs o información de errores
     """
-    return auditoriaService.get_all_logs(data)
+    return auditoriaServiceLog.get_all_logs(data)
 
-def post_buscar_log(data):
+def post_buscar_log(data, headers=None, environ=None):
     """
         Consulta un log específico en CloudWatch en un rango de tiempo
 
@@ -30,6 +33,10 @@ def post_buscar_log(data):
         ----------
         body : json
             json con parametros como fechaInicio (str), fechaFin (str), tipo_log (str), codigoResponsable (int), rolResponsable (str)
+        headers : EnvironHeaders
+            Cabeceras de la petición; identifican al cliente en el control de admisión
+        environ : dict
+            Entorno WSGI; permite detener la consulta de Insights si el cliente se desconecta
 
         Returns
         -------
@@ -53,28 +60,74 @@ def post_buscar_log(data):
             "palabraClave": data.get('palabraClave'),
             "page": data.get('pagina'),
             "limit": data.get('limite', 5000),
+            "cliente": cliente_solicitante(headers),
+            "desconectado": detector_desconexion(environ),
         }
 
         return auditoriaServiceLog.get_one_log(filtros)
     except KeyError as e:
-        return Response(
-            json.dumps({'Status': STATUS_BAD_REQUEST, 'Code': '400', 'Error': f"Missing parameter: {str(e)}"}),
-            status=400,
-            mimetype=MIMETYPE
-        )
+        return jsonResponse.json_response({'Status': STATUS_BAD_REQUEST, 'Code': '400', 'Error': f"Missing parameter: {str(e)}"}, status=400)
     except Exception as e:
-        return Response(
-            json.dumps({'Status': STATUS_INTERNAL_ERROR, 'Code': '500', 'Error': str(e)}),
-            status=500,
-            mimetype=MIMETYPE
-        )
+        return jsonResponse.json_response({'Status': STATUS_INTERNAL_ERROR, 'Code': '500', 'Error': str(e)}, status=500)
 
-def get_logs_filtrados(data):
+def formato_solicitado(headers):
+    """Retorna "ndjson" si el cliente lo negoció mediante la cabecera Accept"""
+    if headers is not None and MIMETYPE_NDJSON in headers.get('Accept', ''):
+        return 'ndjson'
+    return None
+
+def etags_cliente(headers):
+    """ETags de If-None-Match, fuertes y débiles (la compresión debilita el ETag)"""
+    if headers is None or not headers.get('If-None-Match'):
+        return set()
+    return parse_etags(headers.get('If-None-Match')).as_set(include_weak=True)
+
+def cliente_solicitante(headers):
+    """
+    Identifica al cliente para los presupuestos de escaneo: el token de Authorization (resumido,
+    nunca se guarda el token) o, sin él, la primera IP de X-Forwarded-For que agrega el balanceador
+    """
+    if headers is None:
+        return None
+    autorizacion = headers.get('Authorization')
+    if autorizacion:
+        return 'token:' + hashlib.sha256(autorizacion.encode()).hexdigest()[:16]
+    reenviado = headers.get('X-Forwarded-For')
+    if reenviado:
+        return 'ip:' + reenviado.split(',')[0].strip()
+    return None
+
+def detector_desconexion(environ):
+    """
+    Retorna una función que indica si el cliente cerró la conexión, o None si el servidor no
+    expone el socket. El cuerpo ya se leyó, así que un socket legible sin datos significa que
+    el cliente la cerró.
+    """
+    conexion = (environ or {}).get('gunicorn.socket') or (environ or {}).get('werkzeug.socket')
+    if conexion is None:
+        return None
+
+    def desconectado():
+        try:
+            legible, _, _ = select.select([conexion], [], [], 0)
+            return bool(legible) and conexion.recv(1, socket.MSG_PEEK) == b''
+        except ValueError:
+            # Socket TLS (no admite MSG_PEEK) o ya cerrado por el servidor
+            return False
+        except OSError:
+            return True
+    return desconectado
+
+def get_logs_filtrados(data, headers=None, environ=None):
     """
     Consulta logs con filtros y paginación
     
     Parameters
     ----------
+    headers : EnvironHeaders
+        Cabeceras de la petición; "Accept: application/x-ndjson" solicita la respuesta en streaming
+    environ : dict
+        Entorno WSGI; permite detener la consulta de Insights si el cliente se desconecta
     data : MultiDict
         Parámetros de filtrado y paginación:
         - nombreApi: Nombre del API (ej: polux_crud)
@@ -90,6 +143,10 @@ def get_logs_filtrados(data):
         - apiConsumen: API específica que consume el servicio
         - endpoint: Endpoint específico
         - direccionIp: Dirección IP del solicitante
+        - cursor: Cursor opaco retornado en la paginación para pedir la página siguiente
+        - modoParseo: "insights" para que CloudWatch separe los campos del log ("local" por defecto)
+        - formato: "ndjson" para recibir un log por línea en streaming
+        - modoConsulta: "particionada" para dividir el rango en subventanas paralelas y superar el límite de 10000 registros
         
     Returns
     -------
@@ -105,11 +162,10 @@ def get_logs_filtrados(data):
         hora_fin = datetime.fromtimestamp(int(data['fechaFin'])).strftime('%H:%M')
         for param in required_params:
             if param not in data:
-                return Response(
-                    json.dumps({'Status': STATUS_BAD_REQUEST, 'Code': '400', 
-                              'Error': f"Falta el parámetro requerido: {param}"}),
-                    status=400,
-                    mimetype=MIMETYPE
+                return jsonResponse.json_response(
+                    {'Status': STATUS_BAD_REQUEST, 'Code': '400',
+                     'Error': f"Falta el parámetro requerido: {param}"},
+                    status=400
                 )
         
         # Convertir parámetros de paginación
@@ -135,22 +191,27 @@ def get_logs_filtrados(data):
             "ip": data.get('direccionIp', ''),
             "palabraClave": data.get('palabraClave', ''),
             "page": pagina,
-            "limit": limite
+            "limit": limite,
+            "cursor": data.get('cursor'),
+            "modoConsulta": data.get('modoConsulta'),
+            "modoParseo": data.get('modoParseo'),
+            "formato": data.get('formato') or formato_solicitado(headers),
+            "cliente": cliente_solicitante(headers),
+            "desconectado": detector_desconexion(environ)
         }
         type_search = data.get('typeSearch')
+        modo = 'flexible' if type_search == 'flexible' else 'standard'
+        # Una ventana cerrada siempre da el mismo resultado: si el cliente ya lo tiene no se consulta CloudWatch
+        filtros["etag"] = auditoriaService.etag_busqueda(filtros, modo)
+        if filtros["etag"]:
+            no_modificado = auditoriaService.revalidar(filtros, modo, filtros["etag"], etags_cliente(headers))
+            if no_modificado is not None:
+                return no_modificado
         if (type_search== 'flexible'):
             return auditoriaService.get_processed_filtered_logs(filtros)
         else:
             return auditoriaService.get_filtered_logs(filtros)
     except ValueError as e:
-        return Response(
-            json.dumps({'Status': STATUS_BAD_REQUEST, 'Code': '400', 'Error': str(e)}),
-            status=400,
-            mimetype=MIMETYPE
-        )
+        return jsonResponse.json_response({'Status': STATUS_BAD_REQUEST, 'Code': '400', 'Error': str(e)}, status=400)
     except Exception as e:
-        return Response(
-            json.dumps({'Status': STATUS_INTERNAL_ERROR, 'Code': '500', 'Error': str(e)}),
-            status=500,
-            mimetype=MIMETYPE
-        )
\ No newline at end of file
+        return jsonResponse.json_response({'Status': STATUS_INTERNAL_ERROR, 'Code': '500', 'Error': str(e)}, status=500)
\ No newline at end of file
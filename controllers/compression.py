@@ -0,0 +1,127 @@
+import os
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bytes mínimos de una respuesta para comprimirla; las de streaming se comprimen siempre
+COMPRESION_MINIMO = int(os.environ.get("COMPRESION_MINIMO", "1024"))
+COMPRESION_NIVEL_GZIP = int(os.environ.get("COMPRESION_NIVEL_GZIP", "6"))
+COMPRESION_NIVEL_BROTLI = int(os.environ.get("COMPRESION_NIVEL_BROTLI", "5"))
+TIPOS_COMPRIMIBLES = ("application/json", "application/x-ndjson", "text/")
+
+
+class _Compresor:
+    """Interfaz común de zlib (gzip) y brotli para comprimir por partes"""
+    def __init__(self, codificacion):
+        if codificacion == "br":
+            self._objeto = brotli.Compressor(quality=COMPRESION_NIVEL_BROTLI)
+            self.comprimir = self._objeto.process
+            self.vaciar = self._objeto.flush
+            self.terminar = self._objeto.finish
+        else:
+            # wbits 16 + MAX_WBITS produce el formato gzip con encabezado y CRC
+            self._objeto = zlib.compressobj(COMPRESION_NIVEL_GZIP, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self.comprimir = self._objeto.compress
+            self.vaciar = lambda: self._objeto.flush(zlib.Z_SYNC_FLUSH)
+            self.terminar = self._objeto.flush
+
+
+def codificaciones_soportadas():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def elegir_codificacion(accept_encoding):
+    """
+    Elige la codificación según la cabecera Accept-Encoding (respeta los valores q).
+    Con igual preferencia se usa brotli si está instalado.
+
+    Returns
+    -------
+    str
+        "br", "gzip" o None si el cliente no acepta ninguna.
+    """
+    preferencias = {}
+    for parte in (accept_encoding or "").split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        nombre = nombre.strip().lower()
+        if not nombre:
+            continue
+        calidad = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                calidad = float(parametros[2:])
+            except ValueError:
+                calidad = 0.0
+        preferencias[nombre] = calidad
+    mejor, mejor_calidad = None, 0.0
+    for codificacion in codificaciones_soportadas():
+        calidad = preferencias.get(codificacion, preferencias.get("*", 0.0))
+        if calidad > mejor_calidad:
+            mejor, mejor_calidad = codificacion, calidad
+    return mejor
+
+
+def comprimir_streaming(partes, codificacion):
+    """
+    Comprime un iterable de bytes a medida que se recorre, cerrando el original al terminar.
+    Cada parte se vacía del compresor (Z_SYNC_FLUSH) para que el cliente la reciba apenas la
+    aplicación la entrega; quien genera la respuesta agrupa los registros en bloques para no
+    perder relación de compresión.
+    """
+    compresor = _Compresor(codificacion)
+    try:
+        for parte in partes:
+            if isinstance(parte, str):
+                parte = parte.encode("utf-8")
+            if not parte:
+                continue
+            salida = compresor.comprimir(parte) + compresor.vaciar()
+            if salida:
+                yield salida
+        yield compresor.terminar()
+    finally:
+        if hasattr(partes, "close"):
+            partes.close()
+
+
+def _comprimible(response):
+    if response.status_code < 200 or response.status_code in (204, 304):
+        return False
+    if response.direct_passthrough or "Content-Encoding" in response.headers:
+        return False
+    return (response.mimetype or "").startswith(TIPOS_COMPRIMIBLES)
+
+
+def add_compression(app):
+    """Comprime las respuestas JSON/NDJSON con gzip o brotli según lo que acepte el cliente"""
+
+    @app.after_request
+    def comprimir_respuesta(response):
+        if not _comprimible(response):
+            return response
+        response.vary.add("Accept-Encoding")
+        codificacion = elegir_codificacion(request.headers.get("Accept-Encoding"))
+        if codificacion is None:
+            return response
+
+        if response.is_streamed:
+            response.response = comprimir_streaming(response.response, codificacion)
+            response.headers.pop("Content-Length", None)
+        else:
+            datos = response.get_data()
+            if len(datos) < COMPRESION_MINIMO:
+                return response
+            compresor = _Compresor(codificacion)
+            response.set_data(compresor.comprimir(datos) + compresor.terminar())
+
+        response.headers["Content-Encoding"] = codificacion
+        # El cuerpo comprimido ya no es idéntico byte a byte al original
+        etag, debil = response.get_etag()
+        if etag and not debil:
+            response.set_etag(etag, weak=True)
+        return response
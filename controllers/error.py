@@ -1,5 +1,4 @@
-import json
-from flask import Response
+from services import jsonResponse
 
 def add_error_handler(app):
     
@@ -9,7 +8,7 @@ def add_error_handler(app):
             'Status':'Not found resource',
             'Code':'404'
         }
-        return Response(json.dumps(dic_status), status=404, mimetype='application/json')
+        return jsonResponse.json_response(dic_status, status=404)
 
     @app.errorhandler(400)
     def invalid_parameter(e):
@@ -17,4 +16,4 @@ def add_error_handler(app):
             'Status':'invalid parameter',
             'Code':'400'
         }
-        return Response(json.dumps(dic_status), status=400, mimetype='application/json')
\ No newline at end of file
+        return jsonResponse.json_response(dic_status, status=400)
\ No newline at end of file
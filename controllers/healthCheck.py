@@ -1,9 +1,8 @@
-import json
-from flask import Response
+from services import jsonResponse
 
 def health_check(app=None):
     dic_status = {
         'Status': 'ok',
         'Code': '200'
     }
-    return Response(json.dumps(dic_status), status=200, mimetype='application/json')
+    return jsonResponse.json_response(dic_status, status=200)
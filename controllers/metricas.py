@@ -0,0 +1,7 @@
+from flask import Response
+from services import metricas
+
+def get_metricas():
+    """Métricas del servicio en formato de exposición de Prometheus"""
+    cuerpo, content_type = metricas.exportar()
+    return Response(cuerpo, status=200, content_type=content_type)
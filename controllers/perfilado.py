@@ -0,0 +1,69 @@
+import cProfile
+import hmac
+import os
+import time
+import uuid
+from flask import g, request
+from services import tiempos
+
+# Agrega la cabecera Server-Timing con la duración de cada etapa de la petición
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "true").lower() == "true"
+# Sin token el perfilado queda deshabilitado
+PERFILADO_TOKEN = os.environ.get("PERFILADO_TOKEN", "")
+PERFILADO_DIR = os.environ.get("PERFILADO_DIR", "/tmp/perfiles")
+CABECERA_PERFILADO = "X-Perfilado-Token"
+
+
+def perfilado_autorizado(headers):
+    """La petición trae el token de administración configurado en PERFILADO_TOKEN"""
+    token = headers.get(CABECERA_PERFILADO)
+    return bool(PERFILADO_TOKEN) and token is not None and hmac.compare_digest(token, PERFILADO_TOKEN)
+
+
+def guardar_perfil(perfil):
+    """Escribe el perfil en PERFILADO_DIR (abrir con pstats o snakeviz) y retorna el nombre del archivo"""
+    os.makedirs(PERFILADO_DIR, exist_ok=True)
+    nombre = f"{int(time.time())}-{os.getpid()}-{uuid.uuid4().hex[:8]}-{request.endpoint or 'sin_endpoint'}.prof"
+    perfil.dump_stats(os.path.join(PERFILADO_DIR, nombre))
+    return nombre
+
+
+def add_perfilado(app):
+    """
+    Mide las etapas de cada petición (services/tiempos) y las retorna en Server-Timing.
+    Las respuestas en streaming no llevan la cabecera, que se envía antes de recorrer el cuerpo y
+    omitiría las etapas que corren mientras se genera; las NDJSON las reportan en su última línea.
+    Con la cabecera X-Perfilado-Token válida la petición se perfila con cProfile y se escribe
+    un archivo por petición; solo se perfila el hilo de la petición, no los pools auxiliares.
+    """
+
+    @app.before_request
+    def iniciar_medicion():
+        if SERVER_TIMING:
+            tiempos.iniciar()
+        if perfilado_autorizado(request.headers):
+            perfil = cProfile.Profile()
+            try:
+                perfil.enable()
+            except ValueError:
+                # Ya hay otro perfilador activo en el hilo
+                return
+            g.perfil = perfil
+
+    @app.after_request
+    def cerrar_medicion(response):
+        perfil = g.pop("perfil", None)
+        if perfil is not None:
+            perfil.disable()
+            response.headers["X-Perfil"] = guardar_perfil(perfil)
+        registro = tiempos.actual()
+        if registro is not None and not response.is_streamed:
+            response.headers["Server-Timing"] = registro.encabezado()
+        return response
+
+    @app.teardown_request
+    def limpiar_medicion(error=None):
+        perfil = g.pop("perfil", None)
+        if perfil is not None:
+            perfil.disable()
+        tiempos.limpiar()
@@ -3,4 +3,8 @@
 set -e
 set -u
 set -o pipefail
-gunicorn api:app --bind 0.0.0.0:$API_PORT
+# Directorio de métricas compartido por los workers de gunicorn; se limpia en cada arranque
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus_multiproc}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+gunicorn -c gunicorn.conf.py api:app --bind 0.0.0.0:$API_PORT
@@ -0,0 +1,8 @@
+import os
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    # Los gauges "live" dejan de sumar los archivos de métricas de un worker terminado
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,13 +1,41 @@
+import sys
+
+CAMPOS = (
+    'tipo_log',
+    'fecha',
+    'rol_responsable',
+    'nombre_responsable',
+    'documento_responsable',
+    'direccion_accion',
+    'rol',
+    'apis_consumen',
+    'peticion_realizada',
+    'evento_bd',
+    'tipo_error',
+    'mensaje_error',
+)
+
+
+def _internar(valor):
+    return sys.intern(valor) if type(valor) is str else valor
+
+
 class RespuestaLog:
     """
     Modelo para representar un evento de log en respuesta de la api.
+    Usa __slots__ (sin __dict__ por instancia) e interna los tipos de log y de error para que
+    miles de registros compartan la misma cadena.
     """
+    __slots__ = CAMPOS
+
     def __init__(self, **kwargs):
         """
         Inicializa la clase con parámetros nombrados para reducir la complejidad.
         Los nombres de campos siguen el snake_case según convenciones de Python.
+        Solo se internan tipo_log y tipo_error, de unos pocos valores; internar usuarios, IPs y APIs
+        en cada evento cuesta más tiempo del que ahorra en memoria.
         """
-        self.tipo_log = kwargs.get('tipo_log')
+        self.tipo_log = _internar(kwargs.get('tipo_log'))
         self.fecha = kwargs.get('fecha')
         self.rol_responsable = kwargs.get('rol_responsable')
         self.nombre_responsable = kwargs.get('nombre_responsable')
@@ -17,9 +45,26 @@ class RespuestaLog:
         self.apis_consumen = kwargs.get('apis_consumen')
         self.peticion_realizada = kwargs.get('peticion_realizada')
         self.evento_bd = kwargs.get('evento_bd')
-        self.tipo_error = kwargs.get('tipo_error')
+        self.tipo_error = _internar(kwargs.get('tipo_error'))
         self.mensaje_error = kwargs.get('mensaje_error')
 
+    def to_vars(self):
+        """Diccionario con los nombres de los atributos, equivalente a vars() de la clase sin slots"""
+        return {
+            'tipo_log': self.tipo_log,
+            'fecha': self.fecha,
+            'rol_responsable': self.rol_responsable,
+            'nombre_responsable': self.nombre_responsable,
+            'documento_responsable': self.documento_responsable,
+            'direccion_accion': self.direccion_accion,
+            'rol': self.rol,
+            'apis_consumen': self.apis_consumen,
+            'peticion_realizada': self.peticion_realizada,
+            'evento_bd': self.evento_bd,
+            'tipo_error': self.tipo_error,
+            'mensaje_error': self.mensaje_error
+        }
+
     def to_dict(self):
         return {
             'tipoLog': self.tipo_log,
@@ -39,6 +84,6 @@ class RespuestaLog:
         return (f"RespuestaLog(tipo_log={self.tipo_log}, fecha={self.fecha}, "
                 f"peticion_realizada={self.peticion_realizada}, "
                 f"mensaje_error={self.mensaje_error})")
-    
+
     def __repr__(self):
-        return self.__str__()
\ No newline at end of file
+        return self.__str__()
@@ -1,12 +1,13 @@
 from flask import Blueprint, request
 from flask_restx import Api, Resource
-from controllers import auditoria, healthCheck  
+from controllers import auditoria, healthCheck, metricas  
 from flask_cors import CORS, cross_origin
 from conf.conf import api_cors_config
 from models import model_params
 
 def add_routing(app):
     app.register_blueprint(healthCheckController)
+    app.register_blueprint(metricasController)
     app.register_blueprint(auditoriaController, url_prefix='/v1')
 
 health_check_cors_config = {
@@ -31,6 +32,12 @@ CORS(healthCheckController, **health_check_cors_config)
 def health_check():
     return healthCheck.health_check(documentDoc)
 
+metricasController = Blueprint('metricasController', __name__)
+
+@metricasController.route('/metrics')
+def get_metricas():
+    return metricas.get_metricas()
+
 auditoriaController = Blueprint('auditoriaController', __name__)
 CORS(auditoriaController, **auditoria_cors_config)
 
@@ -52,10 +59,16 @@ class DocumentGetAll(Resource):
     def get(self):
         """
             Consulta eventos de logs en AWS CloudWatch.
+            Recorre todas las páginas de eventos del rango y los envía en streaming a medida que llegan.
 
             Parameters
             ----------
-            Ninguno
+            Query string:
+            - log_group_name (str): Grupo de logs; alternativamente nombreApi y entornoApi
+            - startTime, endTime (str): Rango en formato aaaa-mm-dd hh:mm (por defecto la última hora)
+            - filterPattern (str): Patrón de filtro de CloudWatch Logs
+            - particiones (int): Subrangos del rango que se leen en paralelo; se entregan en orden, pero los eventos de cada subrango no vienen ordenados por timestamp
+            - limite (int): Máximo de eventos a retornar
 
             Returns
             -------
@@ -73,6 +86,7 @@ class FilterLogs(Resource):
         206: 'Partial Content',
         400: 'Bad request',
         404: 'Not found',
+        429: 'Insights queue full',
         500: 'Server error'
     }, body=auditoria_params['filtro_log_model'])  
     @documentNamespaceController.expect(auditoria_params['filtro_log_model'])  
@@ -99,14 +113,16 @@ class FilterLogs(Resource):
             Respuesta con los logs filtrados en formato JSON.
         """
         params = request.json 
-        return auditoria.post_buscar_log(params)
+        return auditoria.post_buscar_log(params, request.headers, request.environ)
 
 @documentNamespaceController.route('/buscarLogsFiltrados', strict_slashes=False)
 class FilterLogsPaginated(Resource):
     @documentDoc.doc(responses={
         200: 'Success',
+        206: 'Partial results (scan budget exceeded)',
         400: 'Bad request',
         404: 'Not found',
+        429: 'Scan budget exhausted or Insights queue full',
         500: 'Server error'
     },
     body=auditoria_params['filtro_log_model'])
@@ -175,10 +191,46 @@ class FilterLogsPaginated(Resource):
             "Pagination": {
                 "pagina": 1,
                 "limite": 20,
-                "total registros": 20,
-                "paginas": 1
+                "total registros": 45,
+                "paginas": 3,
+                "snapshot": "9f1c...",
+                "expira": 1751372100,
+                "cursor": "eyJzIjoiOWYxYy4uLiIsInAiOjJ9"
             }
         }
+        ```
+        La primera petición ejecuta la consulta y guarda sus resultados en un snapshot temporal.
+        Para las páginas siguientes se envía el mismo cuerpo con el campo "cursor" retornado,
+        así solo se procesan los logs de la página sin volver a consultar CloudWatch.
+
+        Con "modoConsulta": "particionada" el rango se divide en subventanas que se consultan en paralelo
+        (y se vuelven a dividir si alcanzan el límite de 10000 registros de Insights), permitiendo
+        auditar días completos.
+
+        Con "modoParseo": "insights" (búsqueda estándar) los campos del log se extraen en CloudWatch con
+        cláusulas `parse` y el servicio recibe las filas ya separadas.
+
+        Con "formato": "ndjson" (o la cabecera "Accept: application/x-ndjson") la respuesta se envía en
+        streaming con un log JSON por línea a medida que se procesa; la última línea contiene "Status",
+        "Code" y "Pagination".
+
+        Las búsquedas sobre ventanas ya cerradas responden con ETag y Cache-Control; al repetirlas con
+        la cabecera "If-None-Match" se responde 304 sin consultar CloudWatch.
+
+        "Pagination" incluye "estadisticas" (recordsMatched, recordsScanned y bytesScanned de Insights).
+        Si la consulta supera el presupuesto de bytes escaneados de la petición o del cliente se detiene
+        y se responde 206 con los registros obtenidos hasta ese momento ("presupuesto_excedido": true);
+        si el cliente ya agotó su presupuesto se responde 429 con "Retry-After".
+
+        Las consultas a Insights esperan un cupo del control de admisión, que se reparte por turnos
+        entre clientes; si la cola está llena o la espera se agota también se responde 429.
+
+        Las búsquedas idénticas que llegan al mismo tiempo (mismo grupo de logs, rango, filtros y tipo
+        de búsqueda) comparten una sola consulta a Insights y el procesamiento de cada página; cada
+        petición recibe su propia página.
+
+        Si el cliente cierra la conexión mientras se espera a Insights, la consulta se detiene en
+        CloudWatch para liberar el cupo de consultas concurrentes.
         """
         params = request.json
-        return auditoria.get_logs_filtrados(params)
+        return auditoria.get_logs_filtrados(params, request.headers, request.environ)
@@ -1,33 +1,58 @@
+import hashlib
 import os
 import boto3
 import json
 from datetime import datetime
 from flask import Response
 from models import respuesta_log
+from services import cache, coalescencia, consultaParticionada, controlAdmision, filtros, gestorConsultas, httpClient, jsonResponse, metricas, parserLog, presupuestoEscaneo, snapshots, tiempos
 import re
 import requests
 from pytz import timezone, utc
 from datetime import datetime
 from botocore.config import Config
 import time
-from threading import Thread
-from threading import Event
-from functools import wraps
+from functools import partial, wraps
+from concurrent.futures import ThreadPoolExecutor
 
 MIME_TYPE_JSON = "application/json"
+MIME_TYPE_NDJSON = "application/x-ndjson"
+FORMATO_NDJSON = "ndjson"
 STATUS_BAD_REQUEST = "Bad Request"
 STATUS_SUCCESS = "Successful request"
+STATUS_PARTIAL = "Partial results: scan budget exceeded"
+STATUS_TOO_MANY_REQUESTS = "Too Many Requests"
+STATUS_CLIENT_CLOSED = "Client Closed Request"
 PATRON = re.compile(r"\[(.*?)\] - (.+)")
-ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+ANSI_ESCAPE = parserLog.ANSI_ESCAPE
 ERROR_WSO2_SIN_USUARIO = "Error WSO2 - Sin usuario"
 USUARIO_NO_REGISTRADO = "Usuario no registrado"
 NOMBRE_NO_ENCONTRADO = "Nombre no encontrado"
 LIMIT = 10000
+# Segundos máximos de espera de una consulta de Logs Insights
+QUERY_TIMEOUT = int(os.environ.get("QUERY_TIMEOUT", "60"))
+# Logs que se procesan y enriquecen juntos antes de enviarse en modo ndjson
+NDJSON_BLOQUE = int(os.environ.get("NDJSON_BLOQUE", "100"))
+# Divide el rango en subventanas concurrentes para superar el límite de filas de Insights
+MODO_CONSULTA_PARTICIONADA = "particionada"
+# "insights" delega la separación de campos del log a cláusulas `parse` de Logs Insights
+MODO_PARSEO_INSIGHTS = "insights"
+MODO_PARSEO = os.environ.get("MODO_PARSEO", "local")
 REQUIRE_PARAMS = ["nombreApi","entornoApi","fechaInicio","horaInicio","fechaFin","horaFin",]
 # Tiempo máximo de ejecución para regex (en segundos)
 REGEX_TIMEOUT = 2  # Ajusta según necesidades
 MAX_TEXT_LENGTH = 10000  # Longitud máxima de texto para evitar DoS
-
+# Hilos máximos para consultar usuarios distintos en paralelo
+USUARIOS_MAX_HILOS = int(os.environ.get("USUARIOS_MAX_HILOS", "8"))
+# max-age de Cache-Control para búsquedas sobre ventanas cerradas
+HTTP_CACHE_MAX_AGE = int(os.environ.get("HTTP_CACHE_MAX_AGE", "3600"))
+
+# Búsquedas idénticas simultáneas comparten la consulta a Insights y el procesamiento de cada página;
+# si quien ejecuta se desconecta o agota su presupuesto (antes o durante la consulta), los demás lo
+# intentan por su cuenta y con su propio presupuesto
+_REINTENTABLES = (gestorConsultas.ConsultaCancelada, presupuestoEscaneo.PresupuestoAgotado)
+vuelos_busquedas = coalescencia.Vuelos("busquedas", _REINTENTABLES)
+vuelos_paginas = coalescencia.Vuelos("paginas")
 
 client = boto3.client(
     "logs",
@@ -42,16 +67,13 @@ client = boto3.client(
 def validate_params(params):
     for param in REQUIRE_PARAMS:
         if param not in params:
-            return Response(
-                json.dumps(
-                    {
-                        "Status": STATUS_BAD_REQUEST,
-                        "Code": "400",
-                        "Error": f"Falta el parámetro requerido: {param}",
-                    }
-                ),
+            return jsonResponse.json_response(
+                {
+                    "Status": STATUS_BAD_REQUEST,
+                    "Code": "400",
+                    "Error": f"Falta el parámetro requerido: {param}",
+                },
                 status=400,
-                mimetype=MIME_TYPE_JSON,
             )
 
 def calcular_paginacion(params):
@@ -76,77 +98,309 @@ def formato_rango_fecha(params):
     )
     return start_time, end_time
 
-def procesamiento_respuesta(data,total_registros,page,limit):
-    return Response(
-            json.dumps(
+def procesamiento_respuesta(data,total_registros,page,limit,snapshot=None):
+    status, code = estado_respuesta(snapshot)
+    with metricas.SERIALIZACION_SEGUNDOS.labels(*etiquetas_snapshot(snapshot), "json").time(), tiempos.etapa("serializacion"):
+        return jsonResponse.json_response(
+            {
+                "Status": status,
+                "Code": str(code),
+                "Data": data,
+                "Pagination": metadatos_paginacion(total_registros, page, limit, snapshot),
+            },
+            status=code,
+        )
+
+def estado_respuesta(snapshot):
+    """(Status, código HTTP): 206 si la consulta se detuvo por el presupuesto de escaneo"""
+    if snapshot is not None and snapshot.get("presupuesto_excedido"):
+        return STATUS_PARTIAL, 206
+    return STATUS_SUCCESS, 200
+
+def etiquetas_snapshot(snapshot):
+    """(log_group, modo) de la búsqueda que generó el snapshot, para etiquetar las métricas"""
+    if snapshot is None:
+        return "", ""
+    llave, modo, _ = snapshot["huella"]
+    return llave[0], modo
+
+def respuesta_ndjson(registros,total_registros,page,limit,snapshot=None):
+    """
+    Respuesta en streaming (una línea JSON por log) para que el cliente reciba cada registro
+    apenas se procesa, sin construir el cuerpo completo en memoria.
+    La última línea contiene el estado y los metadatos de paginación y, si se miden los tiempos de
+    la petición, "Tiempos" con el formato de Server-Timing: la cabecera sale antes de procesar los
+    logs y no incluiría esas etapas.
+    """
+    status, code = estado_respuesta(snapshot)
+    registro = tiempos.actual()
+
+    def generar():
+        try:
+            with tiempos.continuar(registro):
+                # Un bloque de NDJSON_BLOQUE logs por parte, como los procesa generar_eventos
+                yield from jsonResponse.iter_ndjson(registros, NDJSON_BLOQUE)
+            pie = {
+                "Status": status,
+                "Code": str(code),
+                "Pagination": metadatos_paginacion(total_registros, page, limit, snapshot),
+            }
+            if registro is not None:
+                pie["Tiempos"] = registro.encabezado()
+            yield jsonResponse.ndjson_line(pie)
+        except Exception as e:
+            print(f"Error generando respuesta ndjson: {str(e)}")
+            yield jsonResponse.ndjson_line({"Status": "Internal Error", "Code": "500", "Error": str(e)})
+
+    return jsonResponse.stream_response(generar(), status=code, mimetype=MIME_TYPE_NDJSON)
+
+def generar_eventos(filas, etiquetas=("", "standard")):
+    """Procesa y enriquece las filas por bloques, entregando cada log apenas está listo"""
+    duracion = 0.0
+    for inicio in range(0, len(filas), NDJSON_BLOQUE):
+        inicio_bloque = time.perf_counter()
+        with tiempos.etapa("procesar"):
+            eventos = procesar_logs(filas[inicio:inicio + NDJSON_BLOQUE])
+        duracion += time.perf_counter() - inicio_bloque
+        for log in eventos:
+            yield log.to_vars()
+    metricas.PROCESAR_LOGS_SEGUNDOS.labels(*etiquetas).observe(duracion)
+
+def metadatos_paginacion(total_registros, page, limit, snapshot=None):
+    """Metadatos de paginación; incluye el cursor de la página siguiente cuando la hay"""
+    paginas = (total_registros + limit - 1) // limit
+    pagination = {
+        "pagina": page,
+        "limite": limit,
+        "total registros": total_registros,
+        "paginas": paginas,
+    }
+    if snapshot is not None:
+        pagination["snapshot"] = snapshot["id"]
+        pagination["expira"] = snapshot["expira"]
+        pagination["truncado"] = snapshot["truncado"]
+        pagination["presupuesto_excedido"] = snapshot["presupuesto_excedido"]
+        pagination["estadisticas"] = snapshot["estadisticas"]
+        pagination["cursor"] = (
+            snapshots.codificar_cursor(snapshot["id"], page + 1) if page < paginas else None
+        )
+    return pagination
+
+def no_logs_found(page,limit):
+    return jsonResponse.json_response(
                 {
-                    "Status": STATUS_SUCCESS,
-                    "Code": "200",
-                    "Data": data,
+                    "Status": "No logs found",
+                    "Code": "404",
+                    "Data": [],
                     "Pagination": {
                         "pagina": page,
-                        "limite": total_registros if limit < LIMIT else LIMIT,
-                        "total registros": total_registros,
-                        "paginas": (total_registros + limit - 1) // limit,
+                        "limite": limit,
+                        "total": 0,
+                        "paginas": 0,
                     },
-                }
-            ),
-            status=200,
-            mimetype=MIME_TYPE_JSON,
-        )
-
-def no_logs_found(page,limit):
-    return Response(
-                json.dumps(
-                    {
-                        "Status": "No logs found",
-                        "Code": "404",
-                        "Data": [],
-                        "Pagination": {
-                            "pagina": page,
-                            "limite": limit,
-                            "total": 0,
-                            "paginas": 0,
-                        },
-                    }
-                ),
+                },
                 status=404,
-                mimetype=MIME_TYPE_JSON,
             )
 def bad_request(e):
-    return Response(
-        json.dumps(
-            {
-                "Status": STATUS_BAD_REQUEST,
-                "Code": "400",
-                "Error": f"Parámetros inválidos: {str(e)}",
-            }
-        ),
+    return jsonResponse.json_response(
+        {
+            "Status": STATUS_BAD_REQUEST,
+            "Code": "400",
+            "Error": f"Parámetros inválidos: {str(e)}",
+        },
         status=400,
-        mimetype=MIME_TYPE_JSON,
+    )
+def demasiadas_solicitudes(e):
+    response = jsonResponse.json_response(
+        {
+            "Status": STATUS_TOO_MANY_REQUESTS,
+            "Code": "429",
+            "Error": str(e),
+        },
+        status=429,
+    )
+    response.headers["Retry-After"] = str(e.reintentar)
+    return response
+def consulta_cancelada(e):
+    # Nadie recibe esta respuesta: el cliente ya cerró la conexión
+    print(f"Búsqueda abandonada: {str(e)}")
+    return jsonResponse.json_response(
+        {
+            "Status": STATUS_CLIENT_CLOSED,
+            "Code": "499",
+            "Error": str(e),
+        },
+        status=499,
     )
 def internal_error(e):
     import traceback
     print(f"Error en get_filtered_logs: {str(e)}")
     print(traceback.format_exc())
 
-    return Response(
-        json.dumps(
-            {
-                "Status": "Internal Error",
-                "Code": "500",
-                "Error": str(e),
-                "Details": (
-                    traceback.format_exc()
-                    if os.environ.get("FLASK_ENV") == "development"
-                    else None
-                ),
-            }
-        ),
+    return jsonResponse.json_response(
+        {
+            "Status": "Internal Error",
+            "Code": "500",
+            "Error": str(e),
+            "Details": (
+                traceback.format_exc()
+                if os.environ.get("FLASK_ENV") == "development"
+                else None
+            ),
+        },
         status=500,
-        mimetype=MIME_TYPE_JSON,
     )
 
+def obtener_snapshot_busqueda(params, modo):
+    """
+    Obtiene las filas crudas de la búsqueda y la página solicitada.
+    Si la petición trae un cursor vigente se reutiliza su snapshot; de lo contrario se ejecuta
+    la consulta en CloudWatch una sola vez y se guardan las filas para las páginas siguientes.
+    Las peticiones simultáneas con la misma huella comparten una sola ejecución y su snapshot.
+
+    Args:
+        params (dict): Parámetros de filtrado y paginación
+        modo (str): "standard" o "flexible"
+
+    Returns:
+        tuple: (snapshot o None si no hay logs, página, límite)
+    """
+    page, limit, log_group, start_time, end_time, data_query, particionada, huella = preparar_busqueda(params, modo)
+
+    snapshot = None
+    if params.get("cursor"):
+        snapshot_id, page = snapshots.decodificar_cursor(params["cursor"])
+        snapshot = snapshots.obtener_snapshot(snapshot_id, huella)
+
+    if snapshot is None:
+        # Quien se une a la búsqueda de otro cliente también necesita presupuesto propio
+        snapshot = vuelos_busquedas.ejecutar(
+            huella,
+            lambda: ejecutar_busqueda(params, modo, log_group, start_time, end_time, data_query, particionada, huella),
+            snapshot_compartible,
+            presupuestoEscaneo.Presupuesto(params.get("cliente")).verificar,
+            params.get("desconectado"),
+        )
+
+    return snapshot, page, limit
+
+def snapshot_compartible(snapshot):
+    """Un snapshot cortado por el presupuesto de quien lo ejecutó no se entrega a otras peticiones"""
+    return snapshot is None or not snapshot["presupuesto_excedido"]
+
+def ejecutar_busqueda(params, modo, log_group, start_time, end_time, data_query, particionada, huella):
+    """Consulta CloudWatch y guarda el snapshot de la búsqueda; retorna None si no hay logs"""
+    presupuesto = presupuestoEscaneo.Presupuesto(params.get("cliente"))
+    desconectado = params.get("desconectado")
+    with tiempos.etapa("insights"):
+        if particionada:
+            data_result = consultaParticionada.ejecutar_query_particionada(
+                partial(
+                    ejecutar_query_cloudwatch,
+                    modo=modo, presupuesto=presupuesto, cliente=params.get("cliente"),
+                ),
+                data_query, log_group, start_time, end_time, LIMIT, desconectado
+            )
+        else:
+            data_result = ejecutar_query_cloudwatch(
+                data_query, log_group, start_time, end_time, modo, presupuesto, desconectado, params.get("cliente")
+            )
+    presupuesto.registrar_exceso()
+    excedido = data_result.get("presupuesto_excedido", False)
+    # Detenida por presupuesto se responde 206 aunque no alcanzara a traer filas
+    if data_result["status"] != "Complete" or not (data_result["results"] or excedido):
+        return None
+    filas = data_result["results"]
+    if modo == "standard":
+        with tiempos.etapa("filtrado"):
+            filas = filtrar_filas(filas, params)
+    return snapshots.crear_snapshot(
+        filas, huella, data_result.get("truncado", False), data_result.get("parcial", False),
+        data_result.get("statistics", {}), excedido,
+    )
+
+def preparar_busqueda(params, modo):
+    """
+    Normaliza los filtros de la búsqueda: grupo de logs, rango en UTC, query de Insights
+    y la huella que identifica el conjunto de filtros.
+
+    Returns:
+        tuple: (página, límite, log_group, start_time, end_time, query, particionada, huella)
+    """
+    page, limit, offset = calcular_paginacion(params)
+    log_group = determiar_entorno(params)
+    start_time, end_time = formato_rango_fecha(params)
+    parseo_insights = modo == "standard" and (params.get("modoParseo") or MODO_PARSEO) == MODO_PARSEO_INSIGHTS
+    data_query = construir_data_query(params, offset, limit, parseo_insights)
+    particionada = params.get("modoConsulta") == MODO_CONSULTA_PARTICIONADA
+    huella = (
+        cache.llave_consulta(log_group, start_time, end_time, data_query),
+        modo,
+        particionada,
+    )
+    return page, limit, log_group, start_time, end_time, data_query, particionada, huella
+
+def etag_busqueda(params, modo):
+    """
+    Base del ETag de la respuesta a partir de los filtros normalizados, la página y el formato.
+    Solo aplica a ventanas cerradas (ver cache.es_ventana_inmutable), cuyo resultado no cambia;
+    retorna None para rangos que llegan hasta el presente. La respuesta agrega el id del snapshot
+    (ver etag_snapshot), porque el cuerpo lleva el snapshot, su expiración y el cursor.
+    """
+    page, limit, _, _, end_time, _, _, huella = preparar_busqueda(params, modo)
+    if not cache.es_ventana_inmutable(end_time):
+        return None
+    if params.get("cursor"):
+        _, page = snapshots.decodificar_cursor(params["cursor"])
+    contenido = repr((huella, page, limit, params.get("formato") or "json"))
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()[:32]
+
+def etag_snapshot(etag, snapshot):
+    """ETag de la respuesta: base de la búsqueda más el snapshot cuyo id y cursor van en el cuerpo"""
+    return f"{etag}.{snapshot['id']}"
+
+def cache_control(snapshot):
+    """El cliente puede reutilizar la respuesta mientras su snapshot (y su cursor) sigue vigente"""
+    return f"public, max-age={max(0, min(HTTP_CACHE_MAX_AGE, snapshot['expira'] - int(time.time())))}"
+
+def aplicar_cache_http(response, etag, snapshot):
+    """
+    Agrega ETag y Cache-Control a la respuesta de una ventana cerrada, salvo que las filas
+    sean parciales (la consulta venció antes de completarse) y otra ejecución pueda traer más.
+    """
+    if etag is None or snapshot.get("parcial"):
+        return response
+    response.set_etag(etag_snapshot(etag, snapshot))
+    response.headers["Cache-Control"] = cache_control(snapshot)
+    return response
+
+def revalidar(params, modo, etag, etags_cliente):
+    """
+    Respuesta 304 si el cliente ya tiene esta búsqueda cerrada y el snapshot de su copia sigue
+    vigente; None si hay que responder completo (p. ej. el snapshot expiró y su cursor ya no sirve).
+    """
+    _, _, _, _, _, _, _, huella = preparar_busqueda(params, modo)
+    for candidato in etags_cliente:
+        base, _, snapshot_id = candidato.partition(".")
+        if base != etag or not snapshot_id:
+            continue
+        snapshot = snapshots.obtener_snapshot(snapshot_id, huella)
+        if snapshot is not None:
+            return no_modificado(etag_snapshot(etag, snapshot), snapshot)
+    return None
+
+def no_modificado(etag, snapshot):
+    """Respuesta 304 para una búsqueda cerrada que el cliente ya tiene"""
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control(snapshot)
+    return response
+
+def pagina_snapshot(snapshot, page, limit):
+    """Filas del snapshot que corresponden a la página solicitada"""
+    offset = (page - 1) * limit
+    return snapshot["filas"][offset:offset + limit]
+
 def get_processed_filtered_logs(params):
     """Obtiene logs filtrados con paginación real desde CloudWatch
 
@@ -159,32 +413,34 @@ def get_processed_filtered_logs(params):
     try:
         # Validar parámetros requeridos
         validate_params(params)
-        # Configurar paginación
-        page, limit, offset = calcular_paginacion(params)
-
-        # Determinar entorno y grupo de logs
-        log_group = determiar_entorno(params)
-
-        # Convertir tiempos a UTC
-        start_time, end_time = formato_rango_fecha(params)
-        # 1. Obtener datos paginados
-        data_query = construir_data_query(params, offset, limit)
-        data_result = ejecutar_query_cloudwatch(
-            data_query, log_group, start_time, end_time
-        )
-        # Procesar resultados
-        if data_result["status"] == "Complete" and data_result["results"]:
-            # Obtener total de registros
-            total_registros = len(data_result["results"])
-            data = [limpiar_caracteres_ansi(log[1]["value"]) for log in data_result["results"]]
-            return procesamiento_respuesta(data,total_registros,page,limit)
-        else:
+        snapshot, page, limit = obtener_snapshot_busqueda(params, "flexible")
+        if snapshot is None:
             return no_logs_found(page,limit)
+        # Solo se limpian los mensajes de la página solicitada
+        data = (limpiar_caracteres_ansi(valor_campo(log, "@message")) for log in pagina_snapshot(snapshot, page, limit))
+        if params.get("formato") == FORMATO_NDJSON:
+            response = respuesta_ndjson(data,len(snapshot["filas"]),page,limit,snapshot)
+        else:
+            with tiempos.etapa("procesar"):
+                data = list(data)
+            response = procesamiento_respuesta(data,len(snapshot["filas"]),page,limit,snapshot)
+        return aplicar_cache_http(response, params.get("etag"), snapshot)
+    except (presupuestoEscaneo.PresupuestoAgotado, controlAdmision.AdmisionRechazada) as e:
+        return demasiadas_solicitudes(e)
+    except gestorConsultas.ConsultaCancelada as e:
+        return consulta_cancelada(e)
     except ValueError as e:
         return bad_request(e)
     except Exception as e:
         return internal_error(e)
 
+def procesar_pagina(filas, snapshot):
+    """Logs procesados y enriquecidos de una página, listos para serializar"""
+    with tiempos.etapa("procesar"):
+        with metricas.PROCESAR_LOGS_SEGUNDOS.labels(*etiquetas_snapshot(snapshot)).time():
+            eventos = procesar_logs(filas)
+        return [log.to_vars() for log in eventos]
+
 def get_filtered_logs(params):
     """Obtiene logs filtrados con paginación real desde CloudWatch
 
@@ -197,34 +453,22 @@ def get_filtered_logs(params):
     try:
         # Validar parámetros requeridos
         validate_params(params)
-        # Configurar paginación
-        page, limit, offset = calcular_paginacion(params)
-
-        # Determinar entorno y grupo de logs
-        log_group = determiar_entorno(params)
-
-        # Convertir tiempos a UTC
-        start_time, end_time = convertir_tiempo_a_utc(
-            f"{params['fechaInicio']} {params['horaInicio']}",
-            f"{params['fechaFin']} {params['horaFin']}"
-        )
-
-        # 1. Obtener datos paginados
-        data_query = construir_data_query(params, offset, limit)
-        data_result = ejecutar_query_cloudwatch(
-            data_query, log_group, start_time, end_time
-        )
-        # Procesar resultados
-        if data_result["status"] == "Complete" and data_result["results"]:
-            eventos = procesar_logs(data_result["results"])
-            eventos_filtrados = aplicar_filtros_adicionales(eventos, params)
-            total_registros = len(eventos_filtrados)
-            # Obtener total de registros
-            data = [vars(log) for log in eventos_filtrados]
-            return procesamiento_respuesta(data,total_registros,page,limit)
-        else:
+        snapshot, page, limit = obtener_snapshot_busqueda(params, "standard")
+        if snapshot is None:
             return no_logs_found(page,limit)
-
+        # Solo se procesan y enriquecen los logs de la página solicitada
+        filas = pagina_snapshot(snapshot, page, limit)
+        if params.get("formato") == FORMATO_NDJSON:
+            response = respuesta_ndjson(generar_eventos(filas, etiquetas_snapshot(snapshot)),len(snapshot["filas"]),page,limit,snapshot)
+        else:
+            data = vuelos_paginas.ejecutar((snapshot["id"], page, limit), lambda: procesar_pagina(filas, snapshot))
+            response = procesamiento_respuesta(data,len(snapshot["filas"]),page,limit,snapshot)
+        return aplicar_cache_http(response, params.get("etag"), snapshot)
+
+    except (presupuestoEscaneo.PresupuestoAgotado, controlAdmision.AdmisionRechazada) as e:
+        return demasiadas_solicitudes(e)
+    except gestorConsultas.ConsultaCancelada as e:
+        return consulta_cancelada(e)
     except ValueError as e:
         return bad_request(e)
     except Exception as e:
@@ -259,111 +503,126 @@ def convertir_tiempo_a_utc(start_str, end_str, timezone_str="America/Bogota"):
         local_tz.localize(end).astimezone(utc).timestamp()
     )
 
-def ejecutar_query_cloudwatch(query_string, log_group, start_time, end_time):
+def ejecutar_query_cloudwatch(query_string, log_group, start_time, end_time, modo="standard", presupuesto=None, desconectado=None, cliente=None):
     """
-    Lanza una consulta a CloudWatch Logs Insights con timeout de 60 segundos.
-    Muestra contador en tiempo real y se detiene exactamente al llegar al límite.
+    Lanza una consulta a CloudWatch Logs Insights con timeout de QUERY_TIMEOUT segundos.
+    El seguimiento lo hace el gestor de consultas del proceso; esta función solo espera su resultado,
+    que se entrega al terminar la consulta o al llegar al límite de registros.
+    Los resultados completos se guardan en caché: por más tiempo si la ventana ya está cerrada
+    y por pocos segundos si llega hasta el presente. `modo` solo etiqueta las métricas.
+    Con `presupuesto` la consulta se detiene al superar los bytes escaneados permitidos y se
+    retorna lo obtenido hasta ese momento con "presupuesto_excedido". Con `desconectado` la consulta
+    se detiene si el cliente cierra la conexión mientras se espera, o si el callable retorna otro
+    motivo de cancelación (lanza ConsultaCancelada).
+    Antes de start_query se espera un cupo del control de admisión, repartido por turnos según
+    `cliente` o el grupo de logs (lanza AdmisionRechazada si la cola está llena).
     """
-    def print_timer(stop_event, start_time, timeout):
-        """Hilo que imprime el tiempo y verifica timeout"""
-        while not stop_event.is_set():
-            elapsed = time.time() - start_time
-            if elapsed >= timeout:
-                stop_event.set()
-                break
-            time.sleep(0.1)
+    llave = cache.llave_consulta(log_group, start_time, end_time, query_string)
+    en_cache = cache.cache_consultas.get(llave)
+    if en_cache is not None:
+        tiempos.contar("insights_cache")
+        return dict(en_cache)
+    if presupuesto is not None:
+        if presupuesto.excedido:
+            # Otra subventana de la misma petición ya agotó el presupuesto
+            return {"status": "Complete", "results": [], "parcial": True, "presupuesto_excedido": True}
+        presupuesto.verificar()
 
     def should_stop_processing(result):
         """Determina si el procesamiento debe detenerse"""
-        is_complete = result.get("status") in ["Complete", "Failed", "Cancelled"]
-        has_max_results = isinstance(result, dict) and len(result.get('results', [])) >= 10000
+        is_complete = gestorConsultas.consulta_terminada(result)
+        has_max_results = len(result.get('results', [])) >= LIMIT
         return is_complete or has_max_results
 
-    def start_query_thread(stop_event, start_total_time, timeout):
-        """Inicia el hilo del timer"""
-        timer_thread = Thread(target=print_timer, args=(stop_event, start_total_time, timeout))
-        timer_thread.daemon = True
-        timer_thread.start()
-        return timer_thread
-
-    def execute_cloudwatch_query():
-        """Ejecuta la consulta a CloudWatch"""
-        return client.start_query(
-            logGroupName=log_group,
-            startTime=start_time,
-            endTime=end_time,
-            queryString=query_string,
-        )
-
-    def process_query_results(query_id, stop_event):
-        """Obtiene y procesa los resultados de la consulta"""
-        result = []
-        while not stop_event.is_set():
-            result = client.get_query_results(queryId=query_id)
-            if should_stop_processing(result):
-                stop_event.set()
-                break
-            time.sleep(2)
-        return result
-
     try:
-        timeout = 60
-        stop_event = Event()
-        start_total_time = time.time()
-
-        timer_thread = start_query_thread(stop_event, start_total_time, timeout)
-        response = execute_cloudwatch_query()
-        query_id = response["queryId"]
-        result = process_query_results(query_id, stop_event)
-
-        if isinstance(result, dict):
-            result["status"] = "Complete" if result.get("status") != "Failed" else "Failed"
-
+        # El cupo se retiene desde start_query hasta que la consulta termina o se detiene
+        with controlAdmision.control.turno(controlAdmision.clave(cliente, log_group), desconectado):
+            inicio = time.perf_counter()
+            response = client.start_query(
+                logGroupName=log_group,
+                startTime=start_time,
+                endTime=end_time,
+                queryString=query_string,
+            )
+            futuro = gestorConsultas.gestor.esperar(
+                client, response["queryId"], QUERY_TIMEOUT, should_stop_processing, (log_group, modo), presupuesto
+            )
+            try:
+                result = gestorConsultas.gestor.resultado(response["queryId"], futuro, desconectado)
+            finally:
+                # Lo escaneado se comparte con los demás workers desde este hilo, no desde el gestor
+                if presupuesto is not None:
+                    presupuesto.guardar()
+        metricas.CONSULTA_SEGUNDOS.labels(log_group, modo).observe(time.perf_counter() - inicio)
+        metricas.CONSULTA_FILAS.labels(log_group, modo).observe(len(result.get("results", [])))
+        estadisticas = result.get("statistics", {})
+        metricas.CONSULTA_BYTES_ESCANEADOS.labels(log_group, modo).observe(estadisticas.get("bytesScanned", 0))
+        metricas.CONSULTA_REGISTROS_ESCANEADOS.labels(log_group, modo).observe(estadisticas.get("recordsScanned", 0))
+        registrar_seguimiento(result.pop("seguimiento", None))
+
+        if result.get("status") == "Complete":
+            cache.cache_consultas.set(llave, dict(result), ttl=cache.ttl_consulta(end_time))
+        # Venció el tiempo o se cortó en LIMIT antes de terminar: otra ejecución puede traer otras filas
+        result["parcial"] = result.get("status") != "Complete"
+        result["status"] = "Complete" if result.get("status") != "Failed" else "Failed"
         return result
 
     except Exception as e:
-        stop_event.set()
         print(f"\nError en la consulta: {str(e)}")
         raise
-    finally:
-        stop_event.set()
-        if 'timer_thread' in locals():
-            timer_thread.join(timeout=1)
-
-def construir_data_query(params, page, limit):
-    """Construye y loguea la query de datos con paginación adecuada"""
-    filtro_busqueda = re.escape(params["filterPattern"])
-    filtro_email_user = re.escape(params["emailUser"])
-    filtro_palabra_clave = re.escape(params.get('palabraClave'))
+
+def registrar_seguimiento(seguimiento):
+    """
+    Suma a los tiempos de la petición la espera en cola de Insights y la holgura del último poll.
+    En búsquedas particionadas se acumulan las de todas las subventanas.
+    """
+    if not seguimiento:
+        return
+    if seguimiento["en_cola"] is not None:
+        tiempos.agregar("insights_cola", seguimiento["en_cola"])
+    if seguimiento["holgura"] is not None:
+        tiempos.agregar("insights_holgura", seguimiento["holgura"], "cota del último intervalo de poll")
+    tiempos.contar("insights_polls", seguimiento["polls"])
+
+def construir_data_query(params, page, limit, parseo_insights=False):
+    """
+    Construye y loguea la query de datos con paginación adecuada.
+    Los filtros sobre campos del log (método, usuario, API, endpoint, IP) se expresan como filtros
+    de Insights sobre esos campos, para lo cual se agregan solo las cláusulas `parse` de esos campos
+    y las filas se limitan a @timestamp y @message con `display`. Con `parseo_insights` se agregan
+    todas, para que CloudWatch entregue los campos del log ya separados.
+    """
+    filtros_busqueda = filtros.construir_filtros(params)
     query_parts = ["fields @timestamp, @message", "| filter @message like /middleware/"]
-    if filtro_busqueda and filtro_email_user:
-        query_parts.append(f"| filter @message like /{filtro_email_user}/")
-    if filtro_busqueda:
-        query_parts.append(f"| filter @message like /{filtro_busqueda}/")
-    if re.escape(params.get('api')):
-        query_parts.append(f"| filter @message like /{params['api']}/")
-    if re.escape(params.get('endpoint')):
-        query_parts.append(f"| filter @message like /{params['endpoint']}/")
-    if re.escape(params.get('ip')):
-        query_parts.append(f"| filter @message like /{params['ip']}/")
-    if filtro_palabra_clave:
-        query_parts.append(f"| filter @message like /{filtro_palabra_clave}/")
+    requeridos = filtros.campos_requeridos(filtros_busqueda)
+    if parseo_insights:
+        query_parts.extend(parserLog.CLAUSULAS_PARSE_INSIGHTS)
+    elif requeridos:
+        query_parts.extend(
+            clausula for campo, clausula in parserLog.CLAUSULAS_PARSE_CAMPOS.items() if campo in requeridos
+        )
+    query_parts.extend(filtro.clausula for filtro in filtros_busqueda if filtro.clausula)
+    if requeridos and not parseo_insights:
+        # Los campos extraídos solo sirven para filtrar; las filas llegan como sin `parse`
+        query_parts.append("| display @timestamp, @message")
     # Paginación correcta en CloudWatch Insights
     query_parts.extend(["| sort @timestamp desc",f"| limit {LIMIT}",])
 
     query = "\n".join(query_parts)
     return query
 
-def procesar_logs(results):
+def procesar_logs(results, enriquecer=True):
     """
     Transforma los logs crudos obtenidos desde CloudWatch en objetos estructurados (RespuestaLog).
-    Extrae y limpia datos del mensaje del log, enriquece con información del usuario (nombre, documento, rol)
-    y construye el objeto final.
+    Es la fase costosa (JSON de la petición, SQL con valores y usuarios), por eso solo se llama
+    con las filas de la página solicitada; para filtrar y contar se usa resumir_fila.
+    Extrae y limpia datos del mensaje del log, construye el objeto final y lo enriquece con
+    información del usuario (nombre, documento, rol) consultando una sola vez por usuario distinto.
 
     Parameters
     ----------
         Resultado de logs (lista de logs crudos de AWS).
-        Funciones auxiliares: extract_log_data, buscar_user_rol, buscar_nombre_user, etc.
+        Funciones auxiliares: parserLog.extract_log_data, enriquecer_eventos, etc.
 
     Return
     ------
@@ -372,21 +631,16 @@ def procesar_logs(results):
     eventos = []
     for log in results:
         try:
-            message = next(item["value"] for item in log if item["field"] == "@message")
-            extracted_data = extract_log_data(message)
+            extracted_data = extraer_datos_fila(log)
 
             fecha_convertida = convert_fecha(extracted_data.get("fecha", ""))
             usuario_log = process_usuario_log(extracted_data.get("usuario", "").strip())
-            nombre, doc, rol = get_user_info(usuario_log)
 
             log_obj = respuesta_log.RespuestaLog(
                 tipo_log=extracted_data.get("tipo_log"),
                 fecha=fecha_convertida,
                 rol_responsable=usuario_log,
-                nombre_responsable=nombre,
-                documento_responsable=doc,
                 direccion_accion=extracted_data.get("direccionAccion", "N/A"),
-                rol=rol,
                 apis_consumen=extracted_data.get("apiConsumen", "N/A"),
                 peticion_realizada=extract_log_json(
                     extracted_data.get("endpoint"),
@@ -399,13 +653,100 @@ def procesar_logs(results):
                     extracted_data.get("metodo"), extracted_data.get("sql_orm")
                 ),
                 tipo_error="N/A",
-                mensaje_error=limpiar_caracteres_ansi(message),
+                mensaje_error=extracted_data["mensaje"],
             )
             eventos.append(log_obj)
         except Exception as e:
             print(f"Error procesando log: {e}")
+    if enriquecer:
+        with tiempos.etapa("usuarios"):
+            enriquecer_eventos(eventos)
     return eventos
 
+def filtrar_filas(results, params):
+    """
+    Retorna las filas crudas que cumplen los filtros de la búsqueda que no se aplicaron en Insights,
+    evaluados en una sola pasada sobre el resumen de cada log (sin sql_orm, data ni usuarios) y antes
+    de cualquier enriquecimiento. Así el total y las páginas se calculan sin procesar logs que no se
+    van a mostrar. Los filtros con cláusula ya se evaluaron en CloudWatch sobre el mensaje original.
+    """
+    predicado = filtros.predicado_local(filtros.construir_filtros(params))
+    if predicado is None:
+        return results
+    filas = []
+    for fila in results:
+        try:
+            if predicado(resumir_fila(fila)):
+                filas.append(fila)
+        except Exception as e:
+            print(f"Error procesando log: {e}")
+    return filas
+
+def resumir_fila(log):
+    """
+    Resumen barato de una fila (fecha, método, endpoint, usuario, IP, API y mensaje) que se calcula
+    para todas las filas; los campos costosos se calculan solo para las filas de la página.
+    """
+    resumen = extraer_datos_fila(log, completo=False)
+    resumen["timestamp"] = valor_campo(log, "@timestamp")
+    return resumen
+
+def valor_campo(log, campo):
+    """Valor de un campo de una fila de Insights; la posición de cada campo depende de la query"""
+    return next((item["value"] for item in log if item["field"] == campo), None)
+
+def extraer_datos_fila(log, completo=True):
+    """Campos del log de una fila de Insights, usando los que ya vienen separados por `parse`"""
+    campos = {item["field"]: item["value"] for item in log}
+    message = campos["@message"]
+    if len(message) > MAX_TEXT_LENGTH:
+        raise ValueError(f"El texto excede la longitud máxima permitida ({MAX_TEXT_LENGTH} caracteres)")
+    if parserLog.tiene_campos_insights(campos):
+        return parserLog.extract_log_data_insights(campos, completo)
+    return parserLog.extract_log_data(message, completo)
+
+def enriquecer_eventos(eventos):
+    """
+    Completa nombre, documento y rol del responsable de cada evento.
+    Los usuarios distintos se resuelven una sola vez y en paralelo, de modo que el costo
+    depende de la cantidad de usuarios y no de la cantidad de logs.
+    """
+    info_usuarios = resolver_usuarios({evento.rol_responsable for evento in eventos})
+    for evento in eventos:
+        nombre, doc, rol = info_usuarios[evento.rol_responsable]
+        evento.nombre_responsable = nombre
+        evento.documento_responsable = doc
+        evento.rol = rol
+
+def resolver_usuarios(usuarios):
+    """
+    Consulta la información de un conjunto de usuarios sobre un pool de hilos acotado.
+
+    Parameters
+    ----------
+    usuarios : set
+        Usuarios (correo) distintos presentes en los logs.
+
+    Returns
+    -------
+    dict
+        Usuario -> (nombre, documento, rol).
+    """
+    usuarios = list(usuarios)
+    if not usuarios:
+        return {}
+    max_hilos = min(USUARIOS_MAX_HILOS, len(usuarios))
+    with ThreadPoolExecutor(max_workers=max_hilos) as executor:
+        return dict(zip(usuarios, executor.map(_get_user_info_seguro, usuarios)))
+
+def _get_user_info_seguro(usuario_log):
+    """Evita que la falla de un usuario interrumpa la resolución de los demás"""
+    try:
+        return get_user_info(usuario_log)
+    except Exception as e:
+        print(f"Error consultando usuario {usuario_log}: {e}")
+        return "Error", "Error", "Error"
+
 def convert_fecha(fecha):
     """Convert date format if possible"""
     try:
@@ -435,57 +776,18 @@ def get_user_info(usuario_log):
     nombre = buscar_nombre_user(doc)
     return nombre, doc, rol
 
-def extract_log_data(log_entry):
-    """
-    Extrae información clave del mensaje del log usando expresiones regulares.
-
-    Parameters
-    ----------
-    message : str
-        El mensaje del log.
-
-    Returns
-    -------
-    dict
-        Diccionario con los datos extraídos.
-    """
-    patterns = {
-        "apiConsumen": r"app_name:\s([^\s,]+)",
-        "api": r"host:\s([^\s,]+)",
-        "endpoint": r"end_point:\s([^\s,]+)",
-        "metodo": r"method:\s([^\s,]+)",
-        "fecha": r"date:\s([^\s,]+)",
-        "direccionAccion": r"ip_user:\s([^\s,]+)",
-        "user_agent": r"user_agent:\s([^\s,]+)",
-        "usuario": r"\b, user:\s([^\s,]+)",
-        "data": r"data:\s({.*})",
-        "tipo_log": r"\[([a-zA-Z0-9\._-]+)(?=\.\w+:)",
-        "sql_orm": r"sql_orm:\s\{(.*?)\},\s+ip_user:",
-    }
-
-    extracted_data = {}
-    clean_log = re.sub(r"\x1b\[[0-9;]*m", "", log_entry)
-
-    for key, pattern in patterns.items():
-        match = re.search(pattern, clean_log)
-        if match:
-            value = match.group(1)
-            if key == "data":
-                try:
-                    extracted_data[key] = json.loads(value)
-                except json.JSONDecodeError:
-                    extracted_data[key] = value
-            else:
-                extracted_data[key] = value
-
-    return extracted_data
-
+@cache.cacheado(
+    cache.cache_nombres,
+    es_negativo=lambda nombre: nombre == NOMBRE_NO_ENCONTRADO,
+    es_error=lambda nombre: isinstance(nombre, dict),
+    ttl_negativo=cache.USUARIOS_CACHE_TTL_NEGATIVO,
+)
 def buscar_nombre_user(documento):
     url = f"{os.environ['API_TERCEROS_CRUD']}/v1/datos_identificacion?query=numero:{documento}"
     headers = {"Content-Type": MIME_TYPE_JSON}
 
     try:
-        response = requests.get(url, headers=headers)
+        response = httpClient.get(url, headers=headers, backend="terceros_crud")
         response.raise_for_status()
         data = response.json()
 
@@ -499,6 +801,12 @@ def buscar_nombre_user(documento):
     except requests.exceptions.RequestException as e:
         return {"error": str(e)}
 
+@cache.cacheado(
+    cache.cache_roles,
+    es_negativo=lambda resultado: USUARIO_NO_REGISTRADO in resultado,
+    es_error=lambda resultado: "error" in resultado,
+    ttl_negativo=cache.USUARIOS_CACHE_TTL_NEGATIVO,
+)
 def buscar_user_rol(user_email):
     """
     Envía un método POST a la URL especificada con la información en formato JSON.
@@ -515,7 +823,7 @@ def buscar_user_rol(user_email):
     payload = {"user": user_email}
 
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = httpClient.post(url, json=payload, headers=headers, backend="autenticacion_mid")
         response_data = response.json()
 
         if (
@@ -535,8 +843,9 @@ def buscar_user_rol(user_email):
                 "documento": response_data.get("documento"),
             }
 
-    except requests.exceptions.RequestException:
-        return {USUARIO_NO_REGISTRADO}
+    except requests.exceptions.RequestException as e:
+        # Una falla de AUTENTICACION_MID no indica que el usuario no exista: no se guarda en caché
+        return {"error": str(e)}
 
 def extract_log_json(endpoint, api, metodo, usuario, data_json):
     data = {}
@@ -548,33 +857,6 @@ def extract_log_json(endpoint, api, metodo, usuario, data_json):
     json_result = json.dumps(data, indent=4)
     return json_result
 
-def aplicar_filtros_adicionales(eventos, params):
-    """Versión modificada para diagnóstico"""
-    if not eventos:
-        return []
-    filtered = eventos
-
-    # Filtrar por método si está especificado
-    if params.get("tipo_log"):
-        filtered = [ log for log in filtered if params["tipo_log"].lower() in log.tipo_log.lower() ]
-
-    # Filtrar por API si está especificado
-    if params.get("api"):
-        filtered = [ log for log in filtered if params["api"].lower() in log.peticion_realizada.lower() ]
-
-    # Filtrar por endpoint si está especificado
-    if params.get("endpoint"):
-        filtered = [ log for log in filtered if params["endpoint"].lower() in log.peticion_realizada.lower() ]
-
-    # Filtrar por IP si está especificado
-    if params.get("ip"):
-        filtered = [log for log in filtered if params["ip"] == log.direccion_accion]
-    # Filtrar por IP si está especificado
-    if params.get("ip"):
-        filtered = [log for log in filtered if params["palabraClave"] in log.data_error]
-
-    return filtered
-
 def reemplazar_valores_log(metodo, log):
     """
     Procesa un log, extrae los valores de una consulta SQL y los reemplaza en su lugar correspondiente.
@@ -4,56 +4,218 @@ import boto3
 import json
 from datetime import datetime
 import time
-from flask import Response
 from models import respuesta_log
+from services import cache, controlAdmision, gestorConsultas, httpClient, jsonResponse, parserLog
 import re
 import requests
 from pytz import timezone, utc
 from datetime import datetime
 import time
+import queue
+import threading
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
 
-APPLICATION_JSON = 'application/json'
 ERROR_NO_USER = "Error WSO2 - Sin usuario"
 DEFAULT_LOG_GROUP = '/ecs/polux_crud_test'
+QUERY_TIMEOUT = int(os.environ.get('QUERY_TIMEOUT', '60'))
+# Lectura de eventos crudos con filter_log_events
+EVENTOS_POR_PAGINA = 10000
+EVENTOS_VENTANA_DEFECTO = int(os.environ.get('EVENTOS_VENTANA_DEFECTO', '3600'))
+EVENTOS_PARTICIONES = int(os.environ.get('EVENTOS_PARTICIONES', '1'))
+EVENTOS_MAX_PARTICIONES = int(os.environ.get('EVENTOS_MAX_PARTICIONES', '8'))
+EVENTOS_PAGINAS_BUFFER = int(os.environ.get('EVENTOS_PAGINAS_BUFFER', '2'))
+# Eventos por parte de la respuesta en streaming
+EVENTOS_BLOQUE = int(os.environ.get('EVENTOS_BLOQUE', '100'))
 
 client = boto3.client(
     'logs',
-    region_name='us-east-1'
+    region_name='us-east-1',
+    # filter_log_events tiene una cuota baja de peticiones por segundo; las lecturas en paralelo
+    # se reintentan con espera adaptativa ante throttling
+    config=Config(retries={'max_attempts': 5, 'mode': 'adaptive'})
 )
 
 def get_all_logs(params):
     """
-        Consulta eventos de logs en CloudWatch para un grupo de logs específico en un rango de tiempo
-        
+        Consulta eventos crudos de logs en CloudWatch (filter_log_events) para un grupo de logs en un rango de tiempo.
+        Sigue todas las páginas (nextToken) y envía los eventos en streaming a medida que llegan, sin depender
+        de las cuotas de Logs Insights.
+
         Parameters
         ----------
         params : MultiDict
-            parámetros que incluyen el nombre del grupo de logs, tiempo de inicio y tiempo de fin
+            - log_group_name: grupo de logs (o nombreApi y entornoApi para construirlo)
+            - startTime, endTime: rango en formato "YYYY-MM-DD HH:MM" hora de Bogotá
+              (por defecto los últimos EVENTOS_VENTANA_DEFECTO segundos)
+            - filterPattern: patrón de filtro de CloudWatch Logs (opcional)
+            - particiones: subrangos que se leen en paralelo (por defecto EVENTOS_PARTICIONES)
+            - limite: máximo de eventos a retornar (opcional)
 
         Returns
         -------
         json : lista de eventos de logs o información de errores
     """
     try:
-        log_group_name = params.get('log_group_name', DEFAULT_LOG_GROUP)
-        start_time = int(time.mktime(datetime(2024, 8, 1, 0, 0).timetuple()) * 1000)
-        end_time = int(time.mktime(datetime(2024, 8, 2, 0, 0).timetuple()) * 1000)
-
-        response = client.filter_log_events(
-            logGroupName=log_group_name,
-            startTime=start_time,
-            endTime=end_time
+        log_group_name = grupo_logs(params)
+        start_time, end_time = rango_milisegundos(params)
+        particiones = min(max(1, int(params.get('particiones', EVENTOS_PARTICIONES))), EVENTOS_MAX_PARTICIONES)
+        limite = int(params.get('limite', 0))
+
+        eventos = leer_eventos_paralelo(
+            log_group_name, start_time, end_time, params.get('filterPattern'), particiones
         )
+        # Se lee el primer evento antes de responder para poder retornar 404 (o 500) con su código real
+        primero = next(eventos, None)
+        if primero is None:
+            return jsonResponse.json_response({'Status': 'No logs found', 'Code': '404', 'Data': []}, status=404)
+
+        estado = {'total': 0, 'error': None}
+        cuerpo = jsonResponse.iter_json_objeto(
+            {'Status': 'Successful request', 'Code': '200'},
+            'Data',
+            transmitir_eventos(primero, eventos, limite, estado),
+            lambda: pie_eventos(estado),
+            EVENTOS_BLOQUE,
+        )
+        return jsonResponse.stream_response(cuerpo)
 
-        events = [{"timestamp": event['timestamp'], "message": event['message']} for event in response.get('events', [])]
-        
-        if not events:
-            return Response(json.dumps({'Status': 'No logs found', 'Code': '404', 'Data': []}), status=404, mimetype=APPLICATION_JSON)
-        
-        return Response(json.dumps({'Status': 'Successful request', 'Code': '200', 'Data': events}), status=200, mimetype=APPLICATION_JSON)
-    
+    except ValueError as e:
+        return jsonResponse.json_response({'Status': 'Bad Request', 'Code': '400', 'Error': str(e)}, status=400)
     except Exception as e:
-        return Response(json.dumps({'Status': 'Internal Error', 'Code': '500', 'Error': str(e)}), status=500, mimetype=APPLICATION_JSON)
+        return jsonResponse.json_response({'Status': 'Internal Error', 'Code': '500', 'Error': str(e)}, status=500)
+
+def grupo_logs(params):
+    """Grupo de logs explícito o construido como en las búsquedas: /ecs/{nombreApi}_{prod|test}"""
+    if params.get('log_group_name'):
+        return params['log_group_name']
+    if params.get('nombreApi') and params.get('entornoApi'):
+        entorno_api = 'prod' if params['entornoApi'].upper() == 'PRODUCTION' else 'test'
+        return f"/ecs/{params['nombreApi']}_{entorno_api}"
+    return DEFAULT_LOG_GROUP
+
+def rango_milisegundos(params):
+    """Convierte startTime y endTime (hora de Bogotá) al rango en epoch milisegundos de filter_log_events"""
+    if not params.get('startTime') and not params.get('endTime'):
+        end_time = int(time.time() * 1000)
+        return end_time - EVENTOS_VENTANA_DEFECTO * 1000, end_time
+
+    local_tz = timezone('America/Bogota')
+    try:
+        local_start_time = datetime.strptime(params['startTime'], "%Y-%m-%d %H:%M")
+        local_end_time = datetime.strptime(params['endTime'], "%Y-%m-%d %H:%M")
+    except (KeyError, ValueError) as e:
+        raise ValueError(f"Rango inválido; startTime y endTime deben tener el formato 'YYYY-MM-DD HH:MM': {str(e)}")
+
+    start_time = int(local_tz.localize(local_start_time).astimezone(utc).timestamp() * 1000)
+    end_time = int(local_tz.localize(local_end_time).astimezone(utc).timestamp() * 1000)
+    if start_time >= end_time:
+        raise ValueError("startTime debe ser anterior a endTime")
+    return start_time, end_time
+
+def leer_eventos(log_group_name, start_time, end_time, filter_pattern=None, detener=None):
+    """
+    Recorre filter_log_events siguiendo nextToken y entrega una página de eventos a la vez.
+    CloudWatch puede retornar páginas vacías con nextToken mientras avanza por el rango; se omiten.
+    """
+    kwargs = {
+        'logGroupName': log_group_name,
+        'startTime': start_time,
+        'endTime': end_time,
+        'limit': EVENTOS_POR_PAGINA,
+    }
+    if filter_pattern:
+        kwargs['filterPattern'] = filter_pattern
+    while detener is None or not detener.is_set():
+        response = client.filter_log_events(**kwargs)
+        eventos = [{"timestamp": event['timestamp'], "message": event['message']} for event in response.get('events', [])]
+        if eventos:
+            yield eventos
+        if not response.get('nextToken'):
+            return
+        kwargs['nextToken'] = response['nextToken']
+
+def particionar_rango(start_time, end_time, particiones):
+    """Divide [start_time, end_time] en subrangos contiguos sin solapamiento (ambos extremos son inclusivos)"""
+    paso = max(1, -(-(end_time - start_time) // particiones))
+    rangos = []
+    for inicio in range(start_time, end_time + 1, paso):
+        rangos.append((inicio, min(inicio + paso - 1, end_time)))
+    return rangos
+
+def _encolar(cola, elemento, detener):
+    """Espera espacio en la cola; retorna False si el lector se detuvo (el cliente se desconectó)"""
+    while not detener.is_set():
+        try:
+            cola.put(elemento, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def leer_eventos_paralelo(log_group_name, start_time, end_time, filter_pattern=None, particiones=1):
+    """
+    Generador de eventos del rango. Con varias particiones cada subrango se lee en un hilo
+    y sus páginas se acumulan (hasta EVENTOS_PAGINAS_BUFFER) mientras se envían los subrangos anteriores.
+    Los subrangos se entregan en orden cronológico, pero dentro de cada uno los eventos llegan en el
+    orden de filter_log_events, que intercala los log streams; no hay orden global por timestamp.
+    Al cerrar el generador los hilos dejan de pedir páginas.
+    """
+    rangos = particionar_rango(start_time, end_time, particiones)
+    if len(rangos) == 1:
+        for pagina in leer_eventos(log_group_name, start_time, end_time, filter_pattern):
+            yield from pagina
+        return
+
+    detener = threading.Event()
+    colas = [queue.Queue(maxsize=EVENTOS_PAGINAS_BUFFER) for _ in rangos]
+
+    def leer(rango, cola):
+        try:
+            for pagina in leer_eventos(log_group_name, *rango, filter_pattern, detener):
+                if not _encolar(cola, pagina, detener):
+                    return
+            _encolar(cola, None, detener)
+        except Exception as e:
+            _encolar(cola, e, detener)
+
+    executor = ThreadPoolExecutor(max_workers=len(rangos))
+    try:
+        for rango, cola in zip(rangos, colas):
+            executor.submit(leer, rango, cola)
+        for cola in colas:
+            while True:
+                pagina = cola.get()
+                if pagina is None:
+                    break
+                if isinstance(pagina, Exception):
+                    raise pagina
+                yield from pagina
+    finally:
+        detener.set()
+        executor.shutdown(wait=False)
+
+def transmitir_eventos(primero, eventos, limite, estado):
+    """Entrega los eventos hasta el límite; un error a mitad del envío queda en `estado` para el pie de la respuesta"""
+    try:
+        yield primero
+        estado['total'] = 1
+        for evento in eventos:
+            if limite and estado['total'] >= limite:
+                break
+            yield evento
+            estado['total'] += 1
+    except Exception as e:
+        print(f"Error leyendo eventos de CloudWatch: {str(e)}")
+        estado['error'] = str(e)
+    finally:
+        eventos.close()
+
+def pie_eventos(estado):
+    pie = {'Total': estado['total']}
+    if estado['error'] is not None:
+        pie['Error'] = estado['error']
+    return pie
 
 def get_one_log(params):
     """
@@ -80,25 +242,33 @@ def get_one_log(params):
         end_time = int(utc_end_time.timestamp())
 
         entorno_api = 'prod' if params['environmentApi'] == 'PRODUCTION' else 'test'
+        log_group = f"/ecs/{params['logGroupName']}_{entorno_api}"
+
+        # Comparte los cupos de consultas de Insights con las búsquedas paginadas
+        desconectado = params.get('desconectado')
+        with controlAdmision.control.turno(controlAdmision.clave(params.get('cliente'), log_group), desconectado):
+            response = client.start_query(
+                logGroupName=log_group,
+                startTime=start_time,
+                endTime=end_time,
+                queryString=query_string
+            )
+            query_id = response['queryId']
 
-        response = client.start_query(
-            logGroupName=f"/ecs/{params['logGroupName']}_{entorno_api}",
-            startTime=start_time,
-            endTime=end_time,
-            queryString=query_string
-        )
-        query_id = response['queryId']
-
-        result = wait_for_query_completion(query_id)
+            result = wait_for_query_completion(query_id, desconectado)
 
         return process_query_results(result)
 
+    except controlAdmision.AdmisionRechazada as e:
+        response = jsonResponse.json_response({'Status': 'Too Many Requests', 'Code': '429', 'Error': str(e)}, status=429)
+        response.headers['Retry-After'] = str(e.reintentar)
+        return response
+    except gestorConsultas.ConsultaCancelada as e:
+        # El cliente ya cerró la conexión: nadie recibe esta respuesta
+        print(f"Búsqueda abandonada: {str(e)}")
+        return jsonResponse.json_response({'Status': 'Client Closed Request', 'Code': '499', 'Error': str(e)}, status=499)
     except Exception as e:
-        return Response(
-            json.dumps({'Status': 'Internal Error', 'Code': '500', 'Error': str(e)}),
-            status=500,
-            mimetype=APPLICATION_JSON
-        )
+        return jsonResponse.json_response({'Status': 'Internal Error', 'Code': '500', 'Error': str(e)}, status=500)
 
 def build_query_string(filtro_busqueda, filtro_email_user):
     """Construye la cadena de consulta para CloudWatch"""
@@ -117,27 +287,23 @@ def build_query_string(filtro_busqueda, filtro_email_user):
     
     return base_query.format(filtro_busqueda) + "| sort @timestamp desc"
 
-def wait_for_query_completion(query_id):
-    """Espera a que la consulta de CloudWatch se complete"""
-    while True:
-        result = client.get_query_results(queryId=query_id)
-        if result['status'] in ['Complete', 'Failed', 'Cancelled']:
-            return result
-        time.sleep(1)
+def wait_for_query_completion(query_id, desconectado=None):
+    """
+    Espera a que la consulta de CloudWatch se complete o venza QUERY_TIMEOUT.
+    Si el cliente se desconecta o la espera falla, la consulta se detiene en CloudWatch.
+    """
+    futuro = gestorConsultas.gestor.esperar(client, query_id, QUERY_TIMEOUT)
+    return gestorConsultas.gestor.resultado(query_id, futuro, desconectado)
 
 def process_query_results(result):
     """Procesa los resultados de la consulta de CloudWatch"""
     if result['status'] != 'Complete' or not result['results']:
-        return Response(
-            json.dumps({'Status': 'No logs found or query failed', 'Code': '404', 'Data': []}),
-            status=404,
-            mimetype=APPLICATION_JSON
-        )
+        return jsonResponse.json_response({'Status': 'No logs found or query failed', 'Code': '404', 'Data': []}, status=404)
 
     events = []
     for log in result['results']:
         message = next(item['value'] for item in log if item['field'] == '@message')
-        extracted_data = extract_log_data(message)
+        extracted_data = parserLog.extract_log_data(message)
         
         fecha_convertida = convert_date(extracted_data.get("fecha"))
         usuario_log = process_user(extracted_data.get("usuario", "").strip())
@@ -147,11 +313,7 @@ def process_query_results(result):
         log_obj = create_log_object(extracted_data, fecha_convertida, usuario_log, rol_usuario, tipo_error, mensaje_error)
         events.append(log_obj)
     
-    return Response(
-        json.dumps({'Status': 'Successful request', 'Code': '200', 'Data': [vars(log) for log in events]}),
-        status=200,
-        mimetype=APPLICATION_JSON
-    )
+    return jsonResponse.json_response({'Status': 'Successful request', 'Code': '200', 'Data': [log.to_vars() for log in events]}, status=200)
 
 def convert_date(date_str):
     """Convierte una cadena de fecha al formato deseado"""
@@ -175,24 +337,24 @@ def get_user_role(usuario_log):
 def create_log_object(extracted_data, fecha_convertida, usuario_log, rol_usuario, tipo_error, mensaje_error):
     """Crea un objeto de log estructurado"""
     return respuesta_log.RespuestaLog(
-        tipoLog=extracted_data.get("tipoLog"),
+        tipo_log=extracted_data.get("tipo_log"),
         fecha=fecha_convertida,
-        rolResponsable=usuario_log,
-        nombreResponsable="N/A",
-        documentoResponsable="N/A",
-        direccionAccion=extracted_data.get("direccionAccion", "N/A"),
+        rol_responsable=usuario_log,
+        nombre_responsable="N/A",
+        documento_responsable="N/A",
+        direccion_accion=extracted_data.get("direccionAccion", "N/A"),
         rol=rol_usuario,
-        apisConsumen=extracted_data.get("apiConsumen", "N/A"),
-        peticionRealizada=extract_log_json(
+        apis_consumen=extracted_data.get("apiConsumen", "N/A"),
+        peticion_realizada=extract_log_json(
             extracted_data.get("endpoint"),
             extracted_data.get("api"),
             extracted_data.get("metodo"),
             usuario_log,
             extracted_data.get("data")
         ),
-        eventoBD=reemplazar_valores_log(extracted_data.get("metodo"), extracted_data.get("sql_orm")),
-        tipoError=tipo_error,
-        mensajeError=mensaje_error
+        evento_bd=reemplazar_valores_log(extracted_data.get("metodo"), extracted_data.get("sql_orm")),
+        tipo_error=tipo_error,
+        mensaje_error=mensaje_error
     )
 
 def extraer_error(log_string):
@@ -242,51 +404,6 @@ def extraer_error(log_string):
 
     return tipo_error, mensaje_error
 
-def extract_log_data(log_entry):
-    """
-    Extrae información clave del mensaje del log usando expresiones regulares.
-
-    Parameters
-    ----------
-    message : str
-        El mensaje del log.
-
-    Returns
-    -------
-    dict
-        Diccionario con los datos extraídos.
-    """
-    patterns = {
-        "apiConsumen": r"app_name:\s([^\s,]+)",
-        "api": r"host:\s([^\s,]+)",
-        "endpoint": r"end_point:\s([^\s,]+)",
-        "metodo": r"method:\s([^\s,]+)",
-        "fecha": r"date:\s([^\s,]+)",
-        "direccionAccion": r"ip_user:\s([^\s,]+)",
-        "user_agent": r"user_agent:\s([^\s,]+)",
-        "usuario": r"\b, user:\s([^\s,]+)",
-        "data": r"data:\s({.*})", 
-        "tipoLog": r"\[([a-zA-Z0-9\._-]+)(?=\.\w+:)",
-        "sql_orm": r"sql_orm:\s\{(.*?)\},\s+ip_user:"
-    }
-
-    extracted_data = {}
-    clean_log = re.sub(r"\x1b\[[0-9;]*m", "", log_entry)
-
-    for key, pattern in patterns.items():
-        match = re.search(pattern, clean_log)
-        if match:
-            value = match.group(1)
-            if key == "data":
-                try:
-                    extracted_data[key] = json.loads(value)
-                except json.JSONDecodeError:
-                    extracted_data[key] = value  
-            else:
-                extracted_data[key] = value
-
-    return extracted_data
-
 def extract_log_json(endpoint,api,metodo,usuario,data_json):
     data = {}
     data["endpoint"] = endpoint
@@ -297,6 +414,7 @@ def extract_log_json(endpoint,api,metodo,usuario,data_json):
     json_result = json.dumps(data, indent=4)
     return json_result
 
+@cache.cacheado(cache.cache_roles, es_error=lambda resultado: isinstance(resultado, dict))
 def buscar_user_rol(user_email):
     """
     Envía un método POST a la URL especificada con la información en formato JSON.
@@ -315,7 +433,7 @@ def buscar_user_rol(user_email):
     try:
         roles_a_excluir = ["Internal/everyone"] 
 
-        response = requests.post(url, json=payload, headers=headers)
+        response = httpClient.post(url, json=payload, headers=headers, backend="autenticacion_mid")
         response.raise_for_status()  
 
         data = response.json()
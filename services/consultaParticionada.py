@@ -0,0 +1,178 @@
+import contextvars
+import heapq
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from services import gestorConsultas
+
+FANOUT_CONCURRENCIA = int(os.environ.get("FANOUT_CONCURRENCIA", "4"))
+FANOUT_VENTANA_INICIAL = int(os.environ.get("FANOUT_VENTANA_INICIAL", "3600"))
+FANOUT_VENTANA_MINIMA = int(os.environ.get("FANOUT_VENTANA_MINIMA", "2"))
+FANOUT_MAX_FILAS = int(os.environ.get("FANOUT_MAX_FILAS", "100000"))
+# Fracción del límite de Insights que se busca llenar con cada subventana
+FANOUT_OBJETIVO = float(os.environ.get("FANOUT_OBJETIVO", "0.5"))
+
+
+def _campo(fila, nombre):
+    return next((item["value"] for item in fila if item["field"] == nombre), "")
+
+
+def _identificador(fila):
+    """Identifica una fila para descartar duplicados en los bordes compartidos entre subventanas"""
+    return _campo(fila, "@ptr") or (_campo(fila, "@timestamp"), _campo(fila, "@message"))
+
+
+def fusionar_resultados(listas):
+    """
+    Mezcla k listas de filas ordenadas por @timestamp descendente en un solo flujo ordenado,
+    sin materializar listas intermedias y descartando filas repetidas.
+    """
+    vistos = set()
+    for fila in heapq.merge(*listas, key=lambda fila: _campo(fila, "@timestamp"), reverse=True):
+        identificador = _identificador(fila)
+        if identificador in vistos:
+            continue
+        vistos.add(identificador)
+        yield fila
+
+
+class _Planificador:
+    """
+    Reparte [start_time, end_time] en subventanas. El tamaño de cada subventana nueva se ajusta
+    a la densidad de filas observada en las ya terminadas, y las que alcanzan el límite de Insights
+    se parten por la mitad y se vuelven a encolar.
+    Las subventanas comparten el segundo de borde porque Insights trabaja con epoch en segundos.
+    """
+    def __init__(self, start_time, end_time, limite):
+        self.end_time = end_time
+        self.limite = limite
+        self.siguiente = start_time
+        self.pendientes = deque()
+        self.filas_observadas = 0
+        self.segundos_observados = 0
+
+    def _tamano(self):
+        if not self.filas_observadas:
+            return FANOUT_VENTANA_INICIAL
+        densidad = self.filas_observadas / max(1, self.segundos_observados)
+        return max(FANOUT_VENTANA_MINIMA, int(self.limite * FANOUT_OBJETIVO / densidad))
+
+    def siguiente_ventana(self):
+        if self.pendientes:
+            return self.pendientes.popleft()
+        if self.siguiente is None:
+            return None
+        inicio = self.siguiente
+        fin = min(self.end_time, inicio + self._tamano())
+        self.siguiente = fin if fin < self.end_time else None
+        return inicio, fin
+
+    def registrar(self, ventana, filas):
+        """Registra el resultado de una subventana; retorna False si debe repetirse partida"""
+        inicio, fin = ventana
+        self.filas_observadas += filas
+        self.segundos_observados += max(1, fin - inicio)
+        if filas >= self.limite and fin - inicio >= FANOUT_VENTANA_MINIMA:
+            medio = (inicio + fin) // 2
+            self.pendientes.extend([(inicio, medio), (medio, fin)])
+            return False
+        return True
+
+
+def ejecutar_query_particionada(ejecutar, query_string, log_group, start_time, end_time, limite, desconectado=None):
+    """
+    Ejecuta la consulta sobre subventanas concurrentes para superar el límite de filas de Insights.
+
+    Parameters
+    ----------
+    ejecutar : callable
+        Función (query_string, log_group, start_time, end_time, desconectado=callable) -> resultado
+        de Insights; debe detener su consulta cuando `desconectado()` retorne un motivo.
+    query_string : str
+        Consulta a ejecutar en cada subventana.
+    log_group : str
+        Grupo de logs.
+    start_time, end_time : int
+        Rango completo en epoch (segundos).
+    limite : int
+        Límite de filas por consulta; una subventana que lo alcanza se parte.
+    desconectado : callable
+        Indica si el cliente cerró la conexión. Si una subventana falla, las que siguen en curso
+        se cancelan (detienen su consulta) y las que no han empezado no se ejecutan.
+
+    Returns
+    -------
+    dict
+        Resultado con el mismo formato de Insights más "truncado" (hubo subventanas mínimas o
+        se alcanzó FANOUT_MAX_FILAS), "parcial" (alguna subventana no terminó a tiempo),
+        "presupuesto_excedido" (se detuvo por el presupuesto de escaneo; no se lanzan más
+        subventanas), "statistics" (suma de las de cada subventana) y "ventanas" (consultas ejecutadas).
+    """
+    planificador = _Planificador(start_time, end_time, limite)
+    listas = []
+    total_filas = 0
+    ventanas = 0
+    truncado = False
+    parcial = False
+    excedido = False
+    estadisticas = {}
+    estado = "Complete"
+    abortada = threading.Event()
+
+    def cancelar_ventana():
+        if abortada.is_set():
+            return gestorConsultas.MOTIVO_ABORTADA
+        return desconectado() if desconectado is not None else None
+
+    with ThreadPoolExecutor(max_workers=FANOUT_CONCURRENCIA) as executor:
+        en_curso = {}
+        try:
+            while True:
+                while len(en_curso) < FANOUT_CONCURRENCIA and total_filas < FANOUT_MAX_FILAS and not excedido:
+                    ventana = planificador.siguiente_ventana()
+                    if ventana is None:
+                        break
+                    # Cada subventana corre con el contexto de la petición para registrar sus tiempos
+                    contexto = contextvars.copy_context()
+                    en_curso[executor.submit(
+                        contexto.run, ejecutar, query_string, log_group, *ventana, desconectado=cancelar_ventana
+                    )] = ventana
+                    ventanas += 1
+                if not en_curso:
+                    break
+                terminados, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for futuro in terminados:
+                    ventana = en_curso.pop(futuro)
+                    resultado = futuro.result()
+                    for llave, valor in resultado.get("statistics", {}).items():
+                        estadisticas[llave] = estadisticas.get(llave, 0) + valor
+                    excedido = excedido or resultado.get("presupuesto_excedido", False)
+                    if resultado.get("status") == "Failed":
+                        estado = "Failed"
+                        continue
+                    parcial = parcial or resultado.get("parcial", False)
+                    filas = resultado.get("results", [])
+                    if planificador.registrar(ventana, len(filas)):
+                        truncado = truncado or len(filas) >= limite
+                        listas.append(filas)
+                        total_filas += len(filas)
+        except BaseException:
+            # Si una subventana falla las demás se detienen en vez de seguir escaneando
+            abortada.set()
+            for futuro in en_curso:
+                futuro.cancel()
+            raise
+
+    if total_filas >= FANOUT_MAX_FILAS and (planificador.pendientes or planificador.siguiente is not None):
+        truncado = True
+
+    return {
+        "status": estado,
+        "results": list(fusionar_resultados(listas)),
+        "truncado": truncado,
+        "parcial": parcial or excedido,
+        "presupuesto_excedido": excedido,
+        "statistics": estadisticas,
+        "ventanas": ventanas,
+    }
@@ -0,0 +1,169 @@
+import fcntl
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from services import gestorConsultas, metricas, tiempos
+
+# Consultas de Logs Insights simultáneas en el host, sumando todos los workers; 0 sin control
+ADMISION_LIMITE = int(os.environ.get("ADMISION_LIMITE", "10"))
+# Cada cupo es un archivo bloqueado con flock; el bloqueo se libera solo si el worker muere
+ADMISION_DIR = os.environ.get("ADMISION_DIR", "/tmp/auditoria_admision")
+# Consultas en espera por worker a partir de las cuales se responde 429
+ADMISION_MAX_COLA = int(os.environ.get("ADMISION_MAX_COLA", "50"))
+ADMISION_ESPERA_MAXIMA = float(os.environ.get("ADMISION_ESPERA_MAXIMA", "30"))
+# Cada cuánto se reintenta tomar un cupo liberado por otro worker
+ADMISION_INTERVALO = float(os.environ.get("ADMISION_INTERVALO", "0.05"))
+# "cliente" o "log_group": entre quiénes se reparten los cupos por turnos
+ADMISION_CLAVE = os.environ.get("ADMISION_CLAVE", "cliente")
+
+RECHAZO_COLA = "cola_llena"
+RECHAZO_ESPERA = "espera"
+
+
+class AdmisionRechazada(Exception):
+    """No hay cupo para la consulta; `reintentar` son los segundos sugeridos para Retry-After"""
+    def __init__(self, mensaje, reintentar):
+        super().__init__(mensaje)
+        self.reintentar = reintentar
+
+
+def clave(cliente, log_group):
+    """Clave entre las que se reparten los cupos según ADMISION_CLAVE"""
+    if ADMISION_CLAVE == "log_group":
+        return log_group
+    return cliente or ""
+
+
+class ControlAdmision:
+    """
+    Limita las consultas de Logs Insights en curso del host. Los cupos se comparten entre
+    procesos mediante archivos bloqueados con flock; dentro del proceso las consultas esperan en
+    una cola por clave (cliente o grupo de logs) y los cupos se asignan por turnos entre claves,
+    de modo que una exportación con muchas subventanas no deja sin cupo a las demás búsquedas.
+    La cola y los turnos son de cada worker: con N workers un cliente puede llegar a N veces su
+    parte y caben hasta N * ADMISION_MAX_COLA consultas en espera en el host.
+    """
+    def __init__(self, limite=ADMISION_LIMITE, directorio=ADMISION_DIR):
+        self.limite = limite
+        self.directorio = directorio
+        self._cond = threading.Condition()
+        self._colas = OrderedDict()
+        self._en_cola = 0
+        self._archivos = {}
+        self._ocupados = set()
+        self._pid = None
+
+    @contextmanager
+    def turno(self, clave, desconectado=None):
+        """
+        Espera un cupo para `clave` y lo retiene mientras dura el bloque.
+        Lanza AdmisionRechazada si la cola está llena o la espera supera ADMISION_ESPERA_MAXIMA,
+        y ConsultaCancelada si el cliente se desconecta mientras espera.
+        """
+        if self.limite <= 0:
+            yield
+            return
+        cupo = self._adquirir(clave, desconectado)
+        try:
+            yield
+        finally:
+            self._liberar(cupo)
+
+    def en_cola(self):
+        with self._cond:
+            return self._en_cola
+
+    def _adquirir(self, clave, desconectado):
+        espera = object()
+        inicio = time.monotonic()
+        with self._cond:
+            if self._en_cola >= ADMISION_MAX_COLA:
+                metricas.ADMISION_RECHAZOS.labels(RECHAZO_COLA).inc()
+                raise AdmisionRechazada("Hay demasiadas consultas en espera, intente más tarde", 5)
+            self._colas.setdefault(clave, deque()).append(espera)
+            self._en_cola += 1
+        metricas.ADMISION_EN_COLA.inc()
+        try:
+            while True:
+                with self._cond:
+                    if self._es_siguiente(clave, espera):
+                        cupo = self._tomar_cupo()
+                        if cupo is not None:
+                            self._retirar(clave, espera)
+                            self._cond.notify_all()
+                            espera_total = time.monotonic() - inicio
+                            metricas.ADMISION_ESPERA_SEGUNDOS.observe(espera_total)
+                            tiempos.agregar("admision", espera_total)
+                            return cupo
+                    if time.monotonic() - inicio >= ADMISION_ESPERA_MAXIMA:
+                        metricas.ADMISION_RECHAZOS.labels(RECHAZO_ESPERA).inc()
+                        raise AdmisionRechazada("No hubo cupo para la consulta a tiempo, intente más tarde", 5)
+                    self._cond.wait(ADMISION_INTERVALO)
+                motivo = gestorConsultas.motivo_cancelacion(desconectado) if desconectado is not None else None
+                if motivo:
+                    raise gestorConsultas.ConsultaCancelada(motivo)
+        except BaseException:
+            with self._cond:
+                self._retirar(clave, espera)
+                self._cond.notify_all()
+            raise
+        finally:
+            metricas.ADMISION_EN_COLA.dec()
+
+    def _es_siguiente(self, clave, espera):
+        """Le toca a la primera espera de la primera clave; la clave atendida pasa al final"""
+        primera = next(iter(self._colas), None)
+        return primera == clave and self._colas[clave][0] is espera
+
+    def _retirar(self, clave, espera):
+        cola = self._colas.get(clave)
+        if cola is None or espera not in cola:
+            return
+        atendida = cola[0] is espera
+        cola.remove(espera)
+        self._en_cola -= 1
+        if not cola:
+            del self._colas[clave]
+        elif atendida:
+            self._colas.move_to_end(clave)
+
+    def _tomar_cupo(self):
+        """Bloquea el primer archivo de cupo libre (en todo el host) o retorna None"""
+        if self._pid != os.getpid():
+            # Tras el fork los descriptores y cupos del proceso padre no son de este worker; se cierran
+            # para no filtrarlos (cerrar la copia no libera el bloqueo que tenga el padre)
+            for archivo in self._archivos.values():
+                try:
+                    os.close(archivo)
+                except OSError:
+                    pass
+            self._pid = os.getpid()
+            self._archivos = {}
+            self._ocupados = set()
+            os.makedirs(self.directorio, exist_ok=True)
+        for cupo in range(self.limite):
+            # flock sobre un descriptor ya bloqueado por este proceso no falla: se lleva la cuenta aparte
+            if cupo in self._ocupados:
+                continue
+            archivo = self._archivos.get(cupo)
+            if archivo is None:
+                archivo = os.open(os.path.join(self.directorio, f"cupo-{cupo}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+                self._archivos[cupo] = archivo
+            try:
+                fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+            self._ocupados.add(cupo)
+            return cupo
+        return None
+
+    def _liberar(self, cupo):
+        with self._cond:
+            fcntl.flock(self._archivos[cupo], fcntl.LOCK_UN)
+            self._ocupados.discard(cupo)
+            self._cond.notify_all()
+
+
+control = ControlAdmision()
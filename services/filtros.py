@@ -0,0 +1,118 @@
+import re
+from collections import namedtuple
+
+METODOS_HTTP = ("GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD")
+
+# campos: campos de Insights que deben extraerse con `parse` para evaluar la cláusula
+# clausula: filtro de Logs Insights; None si la condición solo se puede evaluar localmente
+# predicado: la misma condición sobre el diccionario de parserLog.extract_log_data
+Filtro = namedtuple("Filtro", ["campos", "clausula", "predicado"])
+
+
+def escapar_regex(valor):
+    """Escapa un valor para usarlo dentro de una expresión /.../ de Logs Insights"""
+    return re.escape(valor).replace("/", r"\/")
+
+
+def literal(valor):
+    """Cadena entre comillas para comparaciones de igualdad en Logs Insights"""
+    return '"' + valor.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _contiene(valor, *llaves):
+    valor = valor.lower()
+    return lambda datos: any(valor in (datos.get(llave) or "").lower() for llave in llaves)
+
+
+def construir_filtros(params):
+    """
+    Traduce los filtros de la búsqueda a condiciones sobre campos del log.
+    Los que corresponden a un campo de middleware.go (método, usuario, API, endpoint, IP) se
+    expresan como filtros sobre ese campo; el resto (palabra clave) sobre el mensaje completo.
+
+    Parameters
+    ----------
+    params : dict
+        Filtros de la búsqueda (filterPattern, emailUser, api, endpoint, ip, palabraClave).
+
+    Returns
+    -------
+    list
+        Lista de Filtro.
+    """
+    filtros = []
+
+    metodo = (params.get("filterPattern") or "").strip()
+    if metodo.upper() in METODOS_HTTP:
+        metodo = metodo.upper()
+        filtros.append(Filtro(
+            ("method",),
+            f"| filter method = {literal(metodo)}",
+            lambda datos: (datos.get("metodo") or "").upper() == metodo,
+        ))
+    elif metodo:
+        filtros.append(Filtro(
+            (),
+            f"| filter @message like /{escapar_regex(metodo)}/",
+            lambda datos: metodo in datos["mensaje"],
+        ))
+
+    # En el log solo aparece el usuario, sin el dominio del correo
+    usuario = (params.get("emailUser") or "").strip().split("@")[0]
+    if usuario:
+        filtros.append(Filtro(
+            ("user",),
+            f"| filter user like /(?i){escapar_regex(usuario)}/",
+            _contiene(usuario, "usuario"),
+        ))
+
+    api = (params.get("api") or "").strip()
+    if api:
+        filtros.append(Filtro(
+            ("app_name", "host"),
+            f"| filter app_name like /(?i){escapar_regex(api)}/ or host like /(?i){escapar_regex(api)}/",
+            _contiene(api, "apiConsumen", "api"),
+        ))
+
+    endpoint = (params.get("endpoint") or "").strip()
+    if endpoint:
+        filtros.append(Filtro(
+            ("end_point",),
+            f"| filter end_point like /(?i){escapar_regex(endpoint)}/",
+            _contiene(endpoint, "endpoint"),
+        ))
+
+    ip = (params.get("ip") or "").strip()
+    if ip:
+        filtros.append(Filtro(
+            ("ip_user",),
+            f"| filter ip_user = {literal(ip)}",
+            lambda datos: datos.get("direccionAccion") == ip,
+        ))
+
+    palabra_clave = params.get("palabraClave") or ""
+    if palabra_clave:
+        filtros.append(Filtro(
+            (),
+            f"| filter @message like /{escapar_regex(palabra_clave)}/",
+            lambda datos: palabra_clave in datos["mensaje"],
+        ))
+
+    return filtros
+
+
+def campos_requeridos(filtros):
+    """Campos de Insights que deben extraerse con `parse` para aplicar los filtros"""
+    return {campo for filtro in filtros for campo in filtro.campos}
+
+
+def predicado_local(filtros):
+    """
+    Une en un solo predicado los filtros que no se aplicaron en Insights; None si no hay.
+    Los que tienen cláusula no se repiten: Insights los evalúa sobre el mensaje con códigos ANSI
+    y el predicado sobre el mensaje limpio, así que podrían no coincidir.
+    """
+    predicados = [filtro.predicado for filtro in filtros if filtro.clausula is None]
+    if not predicados:
+        return None
+    return lambda datos: all(predicado(datos) for predicado in predicados)
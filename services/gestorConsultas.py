@@ -0,0 +1,286 @@
+import concurrent.futures
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from services import metricas
+
+POLL_INICIAL = float(os.environ.get("POLL_INICIAL", "0.25"))
+POLL_MAXIMO = float(os.environ.get("POLL_MAXIMO", "5"))
+POLL_FACTOR = float(os.environ.get("POLL_FACTOR", "1.5"))
+# Hilos que ejecutan get_query_results: un poll lento no retrasa el de las demás consultas
+POLL_HILOS = int(os.environ.get("POLL_HILOS", "4"))
+ESTADOS_FINALES = ("Complete", "Failed", "Cancelled", "Timeout")
+# Cada cuánto revisa el hilo de la petición si el cliente sigue conectado mientras espera
+INTERVALO_DESCONEXION = float(os.environ.get("INTERVALO_DESCONEXION", "1"))
+
+MOTIVO_TIEMPO = "tiempo"
+MOTIVO_LIMITE = "limite"
+MOTIVO_ERROR = "error"
+MOTIVO_DESCONEXION = "desconexion"
+MOTIVO_PRESUPUESTO = "presupuesto"
+# Falló otra subventana de la misma búsqueda particionada
+MOTIVO_ABORTADA = "abortada"
+
+
+def consulta_terminada(result):
+    """Una consulta termina cuando CloudWatch reporta un estado final"""
+    return result.get("status") in ESTADOS_FINALES
+
+
+class ConsultaCancelada(Exception):
+    """La espera de la consulta se abandonó (p. ej. el cliente se desconectó) y se detuvo en CloudWatch"""
+    def __init__(self, motivo):
+        super().__init__(f"Consulta cancelada: {motivo}")
+        self.motivo = motivo
+
+
+def motivo_cancelacion(desconectado):
+    """
+    Evalúa el callable `desconectado`: True (el cliente cerró la conexión) o el motivo por el que
+    la espera debe cancelarse; retorna None si puede continuar.
+    """
+    motivo = desconectado()
+    if not motivo:
+        return None
+    return motivo if isinstance(motivo, str) else MOTIVO_DESCONEXION
+
+
+def _codigo_error(e):
+    return getattr(e, "response", {}).get("Error", {}).get("Code")
+
+
+class _Consulta:
+    def __init__(self, client, query_id, timeout, terminada, etiquetas, presupuesto):
+        ahora = time.monotonic()
+        self.client = client
+        self.query_id = query_id
+        self.terminada = terminada
+        self.etiquetas = etiquetas
+        self.presupuesto = presupuesto
+        self.bytes_escaneados = 0
+        self.futuro = Future()
+        self.limite = ahora + timeout
+        self.intervalo = POLL_INICIAL
+        self.proximo = ahora + POLL_INICIAL
+        self.ultimo = None
+        self.polls = 0
+        self.inicio = ahora
+        self.anterior = ahora
+        self.en_cola = None
+        self.holgura = None
+        # Hay un poll de la consulta en curso en el pool del gestor
+        self.atendiendo = False
+
+
+class GestorConsultas:
+    """
+    Dueño de todas las consultas de Logs Insights en curso del proceso.
+    Un único hilo planificador decide cuándo le corresponde a cada una consultar `get_query_results`,
+    con espera creciente (rápida al inicio, más lenta en escaneos largos) y límite de tiempo; los
+    polls se ejecutan en un pool de POLL_HILOS hilos para que uno lento no retrase a los demás.
+    Los hilos de las peticiones solo esperan el `Future` de su consulta.
+    Toda consulta que se abandona antes de terminar (tiempo agotado, límite de filas, error,
+    desconexión del cliente o presupuesto) se detiene con `stop_query` para no seguir ocupando
+    uno de los cupos de consultas concurrentes de la cuenta.
+    """
+    def __init__(self):
+        self._consultas = {}
+        self._cond = threading.Condition()
+        self._hilo = None
+        self._polls = None
+        self._pid = None
+
+    def esperar(self, client, query_id, timeout, terminada=consulta_terminada, etiquetas=None, presupuesto=None):
+        """
+        Registra una consulta ya iniciada y retorna un Future con su resultado.
+
+        Parameters
+        ----------
+        client : botocore client
+            Cliente de CloudWatch Logs con el que se inició la consulta.
+        query_id : str
+            Id retornado por `start_query`.
+        timeout : float
+            Segundos máximos de espera; al vencer se entrega el último resultado parcial
+            (o uno con estado "Timeout" si no alcanzó a consultarse). El resultado trae
+            "seguimiento" con los polls, el tiempo en cola observado y la holgura del último poll.
+        terminada : callable
+            Recibe cada resultado y decide si la espera termina.
+        etiquetas : tuple
+            (log_group, modo) con los que se registran las métricas de la consulta.
+        presupuesto : presupuestoEscaneo.Presupuesto
+            Recibe el avance de bytesScanned en cada poll; si se excede, la consulta se detiene con
+            `stop_query` y se entrega el último resultado marcado con "presupuesto_excedido".
+        """
+        consulta = _Consulta(client, query_id, timeout, terminada, etiquetas, presupuesto)
+        with self._cond:
+            self._asegurar_hilo()
+            self._consultas[query_id] = consulta
+            self._cond.notify()
+        metricas.CONSULTAS_EN_CURSO.inc()
+        return consulta.futuro
+
+    def resultado(self, query_id, futuro, desconectado=None):
+        """
+        Espera el resultado de una consulta registrada con `esperar`.
+        Con `desconectado` (callable, ver motivo_cancelacion) se revisa cada INTERVALO_DESCONEXION
+        segundos si la espera debe cancelarse; si es así, o si la espera se interrumpe (p. ej.
+        gunicorn aborta el worker), la consulta se cancela. Lanza ConsultaCancelada cuando se canceló.
+        """
+        try:
+            while True:
+                try:
+                    return futuro.result(timeout=INTERVALO_DESCONEXION if desconectado else None)
+                except concurrent.futures.TimeoutError:
+                    motivo = motivo_cancelacion(desconectado)
+                    if motivo:
+                        self.cancelar(query_id, motivo)
+        except BaseException:
+            if not futuro.done():
+                self.cancelar(query_id, MOTIVO_ERROR)
+            raise
+
+    def cancelar(self, query_id, motivo):
+        """Deja de seguir la consulta, la detiene en CloudWatch y resuelve su Future con ConsultaCancelada"""
+        with self._cond:
+            consulta = self._consultas.get(query_id)
+        if consulta is not None:
+            self._abandonar(consulta, motivo, excepcion=ConsultaCancelada(motivo))
+
+    def en_curso(self):
+        with self._cond:
+            return len(self._consultas)
+
+    def _asegurar_hilo(self):
+        # Tras el fork de gunicorn el hilo del proceso padre no existe en el hijo
+        if self._pid != os.getpid() or self._hilo is None or not self._hilo.is_alive():
+            if self._pid != os.getpid():
+                self._consultas = {}
+                self._polls = ThreadPoolExecutor(max_workers=POLL_HILOS, thread_name_prefix="gestor-polls")
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._ciclo, name="gestor-consultas", daemon=True)
+            self._hilo.start()
+
+    def _ciclo(self):
+        while True:
+            with self._cond:
+                libres = [c for c in self._consultas.values() if not c.atendiendo]
+                if not libres:
+                    # Sin consultas o todas con un poll en curso: se espera a que alguno termine
+                    self._cond.wait()
+                    continue
+                ahora = time.monotonic()
+                proximo = min(min(c.proximo, c.limite) for c in libres)
+                if proximo > ahora:
+                    self._cond.wait(proximo - ahora)
+                    continue
+                pendientes = [c for c in libres if min(c.proximo, c.limite) <= ahora]
+                for consulta in pendientes:
+                    consulta.atendiendo = True
+            for consulta in pendientes:
+                self._polls.submit(self._atender_seguro, consulta)
+
+    def _atender_seguro(self, consulta):
+        try:
+            self._atender(consulta)
+        except Exception as e:
+            # Un error inesperado con una consulta no debe afectar a las demás
+            print(f"Error al atender la consulta {consulta.query_id}: {e}")
+            self._fallar(consulta, e)
+        finally:
+            with self._cond:
+                consulta.atendiendo = False
+                self._cond.notify()
+
+    def _atender(self, consulta):
+        if time.monotonic() >= consulta.limite:
+            self._abandonar(consulta, MOTIVO_TIEMPO, consulta.ultimo or {"status": "Timeout", "results": []})
+            return
+        try:
+            result = consulta.client.get_query_results(queryId=consulta.query_id)
+        except Exception as e:
+            self._abandonar(consulta, MOTIVO_ERROR, excepcion=e)
+            return
+        ahora = time.monotonic()
+        consulta.polls += 1
+        consulta.ultimo = result
+        # Se observa al salir de Scheduled, así que incluye parte del intervalo de poll
+        if consulta.en_cola is None and result.get("status") != "Scheduled":
+            consulta.en_cola = ahora - consulta.inicio
+        # Lo más que pudo esperar el resultado antes de recogerlo: el último intervalo de poll
+        consulta.holgura = ahora - consulta.anterior
+        consulta.anterior = ahora
+        if consulta.terminada(result):
+            self._consumir(consulta, result)
+            # Terminada por el límite de filas aunque CloudWatch siga escaneando
+            self._abandonar(consulta, MOTIVO_LIMITE, result)
+            return
+        if not self._consumir(consulta, result):
+            result["presupuesto_excedido"] = True
+            self._abandonar(consulta, MOTIVO_PRESUPUESTO, result)
+            return
+        consulta.intervalo = min(POLL_MAXIMO, consulta.intervalo * POLL_FACTOR)
+        consulta.proximo = time.monotonic() + consulta.intervalo
+
+    def _consumir(self, consulta, result):
+        """Reporta al presupuesto los bytes escaneados desde el poll anterior"""
+        if consulta.presupuesto is None:
+            return True
+        escaneados = result.get("statistics", {}).get("bytesScanned", 0)
+        delta = escaneados - consulta.bytes_escaneados
+        consulta.bytes_escaneados = escaneados
+        return consulta.presupuesto.consumir(delta)
+
+    def _fallar(self, consulta, excepcion):
+        """Entrega `excepcion` a quien espera la consulta aunque falle el abandono normal"""
+        try:
+            self._abandonar(consulta, MOTIVO_ERROR, excepcion=excepcion)
+        except Exception as e:
+            print(f"No se pudo abandonar la consulta {consulta.query_id}: {e}")
+        with self._cond:
+            retirada = self._consultas.pop(consulta.query_id, None) is not None
+        if retirada:
+            metricas.CONSULTAS_EN_CURSO.dec()
+        if not consulta.futuro.done():
+            try:
+                consulta.futuro.set_exception(excepcion)
+            except concurrent.futures.InvalidStateError:
+                pass
+
+    def _abandonar(self, consulta, motivo, result=None, excepcion=None):
+        """Entrega el resultado y, si la consulta sigue corriendo en CloudWatch, la detiene"""
+        if not self._resolver(consulta, result, excepcion):
+            return
+        if consulta.ultimo is not None and consulta_terminada(consulta.ultimo):
+            return
+        metricas.CONSULTAS_ABANDONADAS.labels(motivo).inc()
+        try:
+            consulta.client.stop_query(queryId=consulta.query_id)
+        except Exception as e:
+            # InvalidParameterException: terminó entre el último poll y stop_query
+            if _codigo_error(e) != "InvalidParameterException":
+                metricas.CONSULTAS_HUERFANAS.inc()
+                print(f"No se pudo detener la consulta {consulta.query_id}: {e}")
+
+    def _resolver(self, consulta, result=None, excepcion=None):
+        """Retira la consulta y resuelve su Future; retorna False si ya se había resuelto"""
+        with self._cond:
+            if self._consultas.pop(consulta.query_id, None) is None:
+                return False
+        metricas.CONSULTAS_EN_CURSO.dec()
+        if consulta.etiquetas is not None:
+            metricas.CONSULTA_POLLS.labels(*consulta.etiquetas).observe(consulta.polls)
+        if excepcion is not None:
+            consulta.futuro.set_exception(excepcion)
+        else:
+            result["seguimiento"] = {
+                "polls": consulta.polls,
+                "en_cola": consulta.en_cola,
+                "holgura": consulta.holgura,
+            }
+            consulta.futuro.set_result(result)
+        return True
+
+
+gestor = GestorConsultas()
@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from services import metricas
+
+HTTP_TIMEOUT_CONEXION = float(os.environ.get("HTTP_TIMEOUT_CONEXION", "3"))
+HTTP_TIMEOUT_LECTURA = float(os.environ.get("HTTP_TIMEOUT_LECTURA", "10"))
+HTTP_POOL_CONEXIONES = int(os.environ.get("HTTP_POOL_CONEXIONES", "4"))
+HTTP_POOL_MAXIMO = int(os.environ.get("HTTP_POOL_MAXIMO", "16"))
+HTTP_REINTENTOS = int(os.environ.get("HTTP_REINTENTOS", "2"))
+HTTP_BACKOFF = float(os.environ.get("HTTP_BACKOFF", "0.3"))
+
+_adaptador = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _crear_adaptador():
+    """
+    Adaptador con pool de conexiones keep-alive por host.
+    Solo se reintentan los métodos idempotentes (GET, HEAD, etc.) ante fallas de conexión o 502/503/504.
+    """
+    reintentos = Retry(
+        total=HTTP_REINTENTOS,
+        connect=HTTP_REINTENTOS,
+        read=HTTP_REINTENTOS,
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        raise_on_status=False,
+    )
+    return HTTPAdapter(
+        pool_connections=HTTP_POOL_CONEXIONES,
+        pool_maxsize=HTTP_POOL_MAXIMO,
+        max_retries=reintentos,
+    )
+
+
+def get_session():
+    """
+    Retorna la sesión del hilo actual.
+    Cada hilo tiene su propia `Session` (cookies y cabeceras aisladas) pero todas comparten
+    el mismo adaptador, y por lo tanto el mismo pool de conexiones, que es seguro entre hilos.
+    El adaptador se crea de forma perezosa para no heredar sockets abiertos tras el fork de gunicorn.
+    """
+    global _adaptador
+    session = getattr(_local, "session", None)
+    if session is None:
+        with _lock:
+            if _adaptador is None:
+                _adaptador = _crear_adaptador()
+        session = requests.Session()
+        session.mount("http://", _adaptador)
+        session.mount("https://", _adaptador)
+        _local.session = session
+    return session
+
+
+def _solicitar(metodo, url, backend, kwargs):
+    """Ejecuta la petición registrando su latencia y, si falla o responde 5xx, el error del backend"""
+    kwargs.setdefault("timeout", (HTTP_TIMEOUT_CONEXION, HTTP_TIMEOUT_LECTURA))
+    backend = backend or urlsplit(url).netloc
+    inicio = time.perf_counter()
+    try:
+        response = get_session().request(metodo, url, **kwargs)
+    except requests.exceptions.RequestException:
+        metricas.BACKEND_ERRORES.labels(backend).inc()
+        raise
+    finally:
+        metricas.BACKEND_SEGUNDOS.labels(backend).observe(time.perf_counter() - inicio)
+    if response.status_code >= 500:
+        metricas.BACKEND_ERRORES.labels(backend).inc()
+    return response
+
+
+def get(url, backend=None, **kwargs):
+    """GET con el pool compartido; `backend` es la etiqueta de las métricas (por defecto el host)"""
+    return _solicitar("GET", url, backend, kwargs)
+
+
+def post(url, backend=None, **kwargs):
+    """POST con el pool compartido; `backend` es la etiqueta de las métricas (por defecto el host)"""
+    return _solicitar("POST", url, backend, kwargs)
@@ -0,0 +1,115 @@
+import json
+import os
+from flask import Response
+
+MIME_TYPE_JSON = "application/json"
+MIME_TYPE_NDJSON = "application/x-ndjson"
+# auto usa orjson o ujson si están instalados y si no la librería estándar
+JSON_BACKEND = os.environ.get("JSON_BACKEND", "auto").lower()
+
+
+def _default(valor):
+    """Tipos que el JSON estándar no soporta (sets, fechas, etc.)"""
+    if isinstance(valor, (set, frozenset, tuple)):
+        return list(valor)
+    return str(valor)
+
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, default=_default).encode("utf-8")
+
+
+def _cargar_backend(nombre):
+    """Retorna (nombre, función obj -> bytes) del backend solicitado o del mejor disponible"""
+    if nombre in ("auto", "orjson"):
+        try:
+            import orjson
+
+            opciones = orjson.OPT_NON_STR_KEYS
+
+            def orjson_dumps(obj):
+                return orjson.dumps(obj, default=_default, option=opciones)
+            return "orjson", orjson_dumps
+        except ImportError:
+            if nombre == "orjson":
+                print("JSON_BACKEND=orjson pero orjson no está instalado, se usa json")
+    if nombre in ("auto", "ujson"):
+        try:
+            import ujson
+
+            def ujson_dumps(obj):
+                try:
+                    return ujson.dumps(obj, ensure_ascii=False).encode("utf-8")
+                except TypeError:
+                    return _stdlib_dumps(obj)
+            return "ujson", ujson_dumps
+        except ImportError:
+            if nombre == "ujson":
+                print("JSON_BACKEND=ujson pero ujson no está instalado, se usa json")
+    return "json", _stdlib_dumps
+
+
+backend, dumps = _cargar_backend(JSON_BACKEND)
+
+
+def json_response(payload, status=200, mimetype=MIME_TYPE_JSON):
+    """Response de Flask con el cuerpo ya codificado en bytes por el backend configurado"""
+    return Response(dumps(payload), status=status, mimetype=mimetype)
+
+
+def ndjson_line(obj):
+    """Una línea NDJSON en bytes"""
+    return dumps(obj) + b"\n"
+
+
+def iter_ndjson(elementos, bloque=1):
+    """Líneas NDJSON de `elementos`, entregadas de a `bloque` líneas por parte"""
+    partes = []
+    for elemento in elementos:
+        partes.append(ndjson_line(elemento))
+        if len(partes) >= bloque:
+            yield b"".join(partes)
+            partes = []
+    if partes:
+        yield b"".join(partes)
+
+
+def iter_json_objeto(encabezado, llave, elementos, pie=None, bloque=1):
+    """
+    Codifica en streaming un objeto JSON con un arreglo grande:
+    {**encabezado, llave: [elementos...], **pie()}, entregando cada `bloque` elementos apenas se codifican.
+
+    Parameters
+    ----------
+    encabezado : dict
+        Campos que van antes del arreglo.
+    llave : str
+        Nombre del arreglo.
+    elementos : iterable
+        Elementos del arreglo; puede ser un generador.
+    pie : callable
+        Retorna los campos que van después del arreglo; se evalúa al terminar de recorrerlo.
+    bloque : int
+        Elementos por parte entregada; la compresión en streaming vacía el compresor en cada parte.
+    """
+    inicio = dumps(encabezado)[:-1]
+    yield inicio + (b"," if len(inicio) > 1 else b"") + dumps(llave) + b":["
+    separador = b""
+    partes = []
+    for elemento in elementos:
+        partes.append(dumps(elemento))
+        if len(partes) >= bloque:
+            yield separador + b",".join(partes)
+            separador = b","
+            partes = []
+    if partes:
+        yield separador + b",".join(partes)
+    final = dumps(pie()) if pie else b"{}"
+    yield b"]" + (b"," + final[1:] if len(final) > 2 else b"}")
+
+
+def stream_response(generador, status=200, mimetype=MIME_TYPE_JSON):
+    """Response en streaming; evita que un proxy intermedio acumule el cuerpo antes de reenviarlo"""
+    response = Response(generador, status=status, mimetype=mimetype)
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,129 @@
+import os
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Con gunicorn cada worker es un proceso: prometheus_client escribe los valores en archivos de
+# este directorio y /metrics los agrega. Debe existir y estar vacío antes de iniciar los workers.
+PROMETHEUS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90)
+ETIQUETAS_BUSQUEDA = ("log_group", "modo")
+
+CONSULTA_SEGUNDOS = Histogram(
+    "auditoria_insights_consulta_segundos",
+    "Tiempo de una consulta de Logs Insights, desde start_query hasta su resultado",
+    ETIQUETAS_BUSQUEDA,
+    buckets=BUCKETS_SEGUNDOS,
+)
+CONSULTA_POLLS = Histogram(
+    "auditoria_insights_polls",
+    "Llamadas a get_query_results por consulta",
+    ETIQUETAS_BUSQUEDA,
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 48),
+)
+CONSULTA_FILAS = Histogram(
+    "auditoria_insights_filas",
+    "Filas retornadas por consulta de Logs Insights",
+    ETIQUETAS_BUSQUEDA,
+    buckets=(0, 1, 10, 100, 500, 1000, 2500, 5000, 10000),
+)
+CONSULTA_BYTES_ESCANEADOS = Histogram(
+    "auditoria_insights_bytes_escaneados",
+    "bytesScanned reportado por Logs Insights al terminar cada consulta",
+    ETIQUETAS_BUSQUEDA,
+    buckets=(2**20, 2**23, 2**26, 2**28, 2**30, 2**32, 2**34, 2**36),
+)
+CONSULTA_REGISTROS_ESCANEADOS = Histogram(
+    "auditoria_insights_registros_escaneados",
+    "recordsScanned reportado por Logs Insights al terminar cada consulta",
+    ETIQUETAS_BUSQUEDA,
+    buckets=(1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9),
+)
+PRESUPUESTO_EXCEDIDO = Counter(
+    "auditoria_presupuesto_excedido",
+    "Peticiones detenidas o rechazadas por superar el presupuesto de bytes escaneados",
+    ("alcance",),
+)
+CONSULTAS_EN_CURSO = Gauge(
+    "auditoria_insights_en_curso",
+    "Consultas de Logs Insights en seguimiento por el gestor",
+    multiprocess_mode="livesum",
+)
+CONSULTAS_ABANDONADAS = Counter(
+    "auditoria_insights_abandonadas",
+    "Consultas que se dejaron de esperar antes de terminar y se detuvieron con stop_query, por motivo",
+    ("motivo",),
+)
+CONSULTAS_HUERFANAS = Counter(
+    "auditoria_insights_huerfanas",
+    "Consultas abandonadas que no se pudieron detener y pueden seguir corriendo en CloudWatch",
+)
+ADMISION_EN_COLA = Gauge(
+    "auditoria_admision_en_cola",
+    "Consultas de Logs Insights esperando un cupo del control de admisión",
+    multiprocess_mode="livesum",
+)
+ADMISION_ESPERA_SEGUNDOS = Histogram(
+    "auditoria_admision_espera_segundos",
+    "Tiempo de espera hasta obtener un cupo para start_query",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30),
+)
+ADMISION_RECHAZOS = Counter(
+    "auditoria_admision_rechazos",
+    "Consultas rechazadas con 429 por el control de admisión (cola llena o espera agotada)",
+    ("motivo",),
+)
+PROCESAR_LOGS_SEGUNDOS = Histogram(
+    "auditoria_procesar_logs_segundos",
+    "Tiempo de procesar y enriquecer los logs de una página",
+    ETIQUETAS_BUSQUEDA,
+    buckets=BUCKETS_SEGUNDOS,
+)
+SERIALIZACION_SEGUNDOS = Histogram(
+    "auditoria_serializacion_segundos",
+    "Tiempo de serializar la respuesta de una búsqueda",
+    ETIQUETAS_BUSQUEDA + ("formato",),
+    buckets=BUCKETS_SEGUNDOS,
+)
+COALESCENCIA = Counter(
+    "auditoria_coalescencia",
+    "Llamadas que ejecutaron el trabajo (lider) o esperaron el de una idéntica en curso (compartida)",
+    ("vuelo", "rol"),
+)
+BACKEND_SEGUNDOS = Histogram(
+    "auditoria_backend_segundos",
+    "Latencia de las llamadas HTTP a las APIs de usuarios",
+    ("backend",),
+    buckets=BUCKETS_SEGUNDOS,
+)
+BACKEND_ERRORES = Counter(
+    "auditoria_backend_errores",
+    "Llamadas HTTP a las APIs de usuarios que fallaron (conexión, tiempo o 5xx)",
+    ("backend",),
+)
+CACHE = Counter(
+    "auditoria_cache",
+    "Búsquedas en las cachés en memoria por resultado (hit o miss)",
+    ("cache", "resultado"),
+)
+
+
+def exportar():
+    """
+    Retorna (cuerpo, content type) en el formato de exposición de Prometheus.
+    En modo multiproceso se agregan los valores de todos los workers.
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro), CONTENT_TYPE_LATEST
@@ -0,0 +1,150 @@
+import json
+import re
+
+ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+# Encabezado de beego: "2025/07/01 12:00:21.715 [I] [middleware.go:163] {"
+ENCABEZADO = re.compile(r"(?:\[(?P<nivel>[A-Z])\]\s*)?\[(?P<archivo>[a-zA-Z0-9\._-]+?)\.\w+:\d*\]")
+# Inicio de un campo del mapa de middleware.go: solo cuenta después de "{" o ","
+CAMPO = re.compile(r"[{,]\s*(app_name|host|end_point|method|date|sql_orm|ip_user|user_agent|user|data):\s")
+TOKEN = re.compile(r"[^\s,]+")
+FIN_SQL_ORM = re.compile(r"\},\s+ip_user:")
+
+# Nombre del campo en el log -> llave usada por los servicios
+LLAVES = {
+    "app_name": "apiConsumen",
+    "host": "api",
+    "end_point": "endpoint",
+    "method": "metodo",
+    "date": "fecha",
+    "ip_user": "direccionAccion",
+    "user_agent": "user_agent",
+    "user": "usuario",
+}
+
+
+def extract_log_data(log_entry, completo=True):
+    """
+    Extrae todos los campos de una línea de middleware.go de beego recorriéndola una sola vez.
+    Los códigos ANSI se eliminan una única vez y el mensaje limpio se retorna en "mensaje"
+    para no volver a procesarlo.
+
+    Parameters
+    ----------
+    log_entry : str
+        El mensaje del log tal como llega de CloudWatch.
+    completo : bool
+        Con False se omiten sql_orm y data (el JSON no se decodifica): resumen barato
+        para filtrar y contar logs que quizá no se muestren.
+
+    Returns
+    -------
+    dict
+        apiConsumen, api, endpoint, metodo, fecha, direccionAccion, user_agent, usuario,
+        sql_orm, data (dict si es JSON válido), tipo_log (archivo que generó el log),
+        nivel (I, W, E...) y mensaje; solo se incluyen los campos presentes.
+    """
+    mensaje = ANSI_ESCAPE.sub("", log_entry)
+    extracted_data = {"mensaje": mensaje}
+
+    encabezado = ENCABEZADO.search(mensaje)
+    if encabezado:
+        extracted_data["tipo_log"] = encabezado.group("archivo")
+        if encabezado.group("nivel"):
+            extracted_data["nivel"] = encabezado.group("nivel")
+        posicion = encabezado.end()
+    else:
+        posicion = 0
+
+    while True:
+        campo = CAMPO.search(mensaje, posicion)
+        if not campo:
+            break
+        nombre = campo.group(1)
+        inicio = campo.end()
+
+        if nombre == "data":
+            if not completo:
+                break
+            # data es el último campo: va hasta la última llave de la línea
+            fin_linea = mensaje.find("\n", inicio)
+            fin = mensaje.rfind("}", inicio, len(mensaje) if fin_linea == -1 else fin_linea)
+            if mensaje.startswith("{", inicio) and fin != -1:
+                valor = mensaje[inicio:fin + 1]
+                try:
+                    extracted_data["data"] = json.loads(valor)
+                except json.JSONDecodeError:
+                    extracted_data["data"] = valor
+            break
+
+        if nombre == "sql_orm":
+            fin = FIN_SQL_ORM.search(mensaje, inicio)
+            if mensaje.startswith("{", inicio) and fin:
+                if completo:
+                    extracted_data.setdefault("sql_orm", mensaje[inicio + 1:fin.start()])
+                posicion = fin.start() + 1
+            else:
+                posicion = inicio
+            continue
+
+        token = TOKEN.match(mensaje, inicio)
+        if token:
+            extracted_data.setdefault(LLAVES[nombre], token.group())
+            posicion = token.end()
+        else:
+            posicion = inicio
+
+    return extracted_data
+
+
+# Cláusulas `parse` de Logs Insights equivalentes a extract_log_data, por campo extraído: la
+# extracción se hace en CloudWatch y cada fila llega con los campos ya separados.
+CLAUSULAS_PARSE_CAMPOS = {
+    "tipo_log": r"| parse @message /\[(?<tipo_log>[a-zA-Z0-9._-]+?)\.\w+:\d*\]/",
+    "app_name": r"| parse @message /[{,]\s*app_name:\s(?<app_name>[^\s,]+)/",
+    "host": r"| parse @message /[{,]\s*host:\s(?<host>[^\s,]+)/",
+    "end_point": r"| parse @message /[{,]\s*end_point:\s(?<end_point>[^\s,]+)/",
+    "method": r"| parse @message /[{,]\s*method:\s(?<method>[^\s,]+)/",
+    "date": r"| parse @message /[{,]\s*date:\s(?<date>[^\s,]+)/",
+    "sql_orm": r"| parse @message /[{,]\s*sql_orm:\s\{(?<sql_orm>.*?)\},\s+ip_user:/",
+    "ip_user": r"| parse @message /[{,]\s*ip_user:\s(?<ip_user>[^\s,]+)/",
+    "user_agent": r"| parse @message /[{,]\s*user_agent:\s(?<user_agent>[^\s,]+)/",
+    "user": r"| parse @message /[{,]\s*user:\s(?<user>[^\s,]+)/",
+    "data": r"| parse @message /[{,]\s*data:\s(?<data>\{.*\})/",
+}
+CLAUSULAS_PARSE_INSIGHTS = list(CLAUSULAS_PARSE_CAMPOS.values())
+CAMPOS_INSIGHTS = ("tipo_log", "sql_orm", "data") + tuple(LLAVES)
+
+
+def tiene_campos_insights(campos):
+    """Indica si la fila trae campos extraídos por las cláusulas `parse` de Insights"""
+    return any(campo in campos for campo in CAMPOS_INSIGHTS)
+
+
+def extract_log_data_insights(campos, completo=True):
+    """
+    Construye el mismo diccionario de extract_log_data a partir de los campos ya extraídos
+    por Logs Insights; solo se limpia ANSI del mensaje completo.
+
+    Parameters
+    ----------
+    campos : dict
+        Campo -> valor de una fila de `get_query_results`.
+    completo : bool
+        Con False se omiten sql_orm y data, como en extract_log_data.
+    """
+    extracted_data = {"mensaje": ANSI_ESCAPE.sub("", campos.get("@message", ""))}
+    for campo, llave in LLAVES.items():
+        if campos.get(campo):
+            extracted_data[llave] = campos[campo]
+    if "tipo_log" in campos:
+        extracted_data["tipo_log"] = campos["tipo_log"]
+    if not completo:
+        return extracted_data
+    if "sql_orm" in campos:
+        extracted_data["sql_orm"] = campos["sql_orm"]
+    if "data" in campos:
+        try:
+            extracted_data["data"] = json.loads(campos["data"])
+        except json.JSONDecodeError:
+            extracted_data["data"] = campos["data"]
+    return extracted_data
@@ -0,0 +1,193 @@
+import fcntl
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from services import metricas
+
+# Bytes que puede escanear Logs Insights en una petición (sumando sus subventanas); 0 sin límite
+PRESUPUESTO_BYTES_PETICION = int(os.environ.get("PRESUPUESTO_BYTES_PETICION", "0"))
+# Bytes que puede escanear un cliente en cada ventana de PRESUPUESTO_VENTANA segundos; 0 sin límite
+PRESUPUESTO_BYTES_CLIENTE = int(os.environ.get("PRESUPUESTO_BYTES_CLIENTE", "0"))
+PRESUPUESTO_VENTANA = int(os.environ.get("PRESUPUESTO_VENTANA", "3600"))
+# El consumo de cada cliente se comparte entre los workers del host: un archivo por cliente bloqueado con flock
+PRESUPUESTO_DIR = os.environ.get("PRESUPUESTO_DIR", "/tmp/auditoria_presupuesto")
+# Clientes (archivos y entradas en memoria) a partir de los cuales se descartan los de ventanas ya terminadas
+PRESUPUESTO_MAX_CLIENTES = int(os.environ.get("PRESUPUESTO_MAX_CLIENTES", "1024"))
+
+ALCANCE_PETICION = "peticion"
+ALCANCE_CLIENTE = "cliente"
+
+# Consumo de cada cliente visto por este worker: cliente -> [inicio de la ventana, bytes]. Incluye lo
+# escaneado aún sin guardar en el archivo compartido, que se acumula en _pendientes
+_consumo_clientes = {}
+_pendientes = {}
+_lock = threading.Lock()
+
+
+class PresupuestoAgotado(Exception):
+    """El cliente ya consumió su presupuesto de la ventana; `reintentar` son los segundos que faltan"""
+    def __init__(self, reintentar):
+        super().__init__("Se agotó el presupuesto de escaneo del cliente, intente más tarde")
+        self.reintentar = reintentar
+
+
+def _abrir(ruta, bloqueo=fcntl.LOCK_EX):
+    """Abre y bloquea el archivo de un cliente; retorna None si `bloqueo` no bloqueante no lo obtuvo"""
+    while True:
+        try:
+            archivo = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o644)
+        except FileNotFoundError:
+            os.makedirs(PRESUPUESTO_DIR, exist_ok=True)
+            continue
+        try:
+            fcntl.flock(archivo, bloqueo)
+        except BlockingIOError:
+            os.close(archivo)
+            return None
+        # Otro worker pudo borrarlo (ventana terminada) entre open y flock
+        if os.fstat(archivo).st_nlink:
+            return archivo
+        os.close(archivo)
+
+
+def _leer(archivo):
+    """[inicio de la ventana (epoch), bytes] guardados en el archivo, o None si está vacío"""
+    try:
+        inicio, usados = os.pread(archivo, 64, 0).split()
+        return [float(inicio), float(usados)]
+    except ValueError:
+        return None
+
+
+def _depurar(ahora):
+    """Borra los archivos de clientes cuya ventana ya terminó; omite los que otro worker tiene bloqueados"""
+    for nombre in os.listdir(PRESUPUESTO_DIR):
+        ruta = os.path.join(PRESUPUESTO_DIR, nombre)
+        archivo = _abrir(ruta, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        if archivo is None:
+            continue
+        try:
+            entrada = _leer(archivo)
+            if entrada is None or ahora - entrada[0] >= PRESUPUESTO_VENTANA:
+                os.unlink(ruta)
+        finally:
+            os.close(archivo)
+
+
+@contextmanager
+def _ventana_cliente(cliente):
+    """
+    Entrada [inicio de la ventana, bytes] del cliente en la ventana vigente (se reinicia cuando la
+    anterior termina). El archivo del cliente queda bloqueado durante el bloque y al salir se
+    guardan los cambios. El inicio es epoch para que sea comparable entre procesos.
+    """
+    ahora = time.time()
+    ruta = os.path.join(PRESUPUESTO_DIR, hashlib.sha1(cliente.encode("utf-8")).hexdigest())
+    archivo = _abrir(ruta)
+    try:
+        entrada = _leer(archivo)
+        if entrada is None and len(os.listdir(PRESUPUESTO_DIR)) > PRESUPUESTO_MAX_CLIENTES:
+            _depurar(ahora)
+        if entrada is None or ahora - entrada[0] >= PRESUPUESTO_VENTANA:
+            entrada = [ahora, 0]
+        guardada = list(entrada)
+        yield entrada
+        if entrada != guardada:
+            contenido = f"{entrada[0]} {entrada[1]}".encode("utf-8")
+            os.ftruncate(archivo, 0)
+            os.pwrite(archivo, contenido, 0)
+    finally:
+        # Cerrar el descriptor libera el bloqueo
+        os.close(archivo)
+
+
+def _depurar_memoria(ahora):
+    """Descarta los clientes cuya ventana ya terminó y no tienen consumo sin guardar"""
+    for cliente in [c for c, (inicio, _) in _consumo_clientes.items() if ahora - inicio >= PRESUPUESTO_VENTANA]:
+        if not _pendientes.get(cliente):
+            del _consumo_clientes[cliente]
+
+
+class Presupuesto:
+    """
+    Bytes escaneados por las consultas de una petición. El gestor de consultas reporta el avance de
+    `bytesScanned` de cada consulta en curso y la detiene cuando la petición o su cliente superan su
+    presupuesto. El consumo por cliente se comparte entre los workers del host (PRESUPUESTO_DIR):
+    el hilo del gestor solo lo suma en memoria y el hilo de la petición lo guarda en el archivo
+    al verificar y al terminar cada consulta, por lo que lo escaneado en otros workers se ve con
+    ese retraso.
+    """
+    def __init__(self, cliente=None, limite=None, limite_cliente=None):
+        self.cliente = cliente
+        self.limite = PRESUPUESTO_BYTES_PETICION if limite is None else limite
+        self.limite_cliente = PRESUPUESTO_BYTES_CLIENTE if limite_cliente is None else limite_cliente
+        self.usados = 0
+        self.excedido = None
+        self._lock = threading.Lock()
+
+    def verificar(self):
+        """Lanza PresupuestoAgotado si el cliente ya no tiene presupuesto en la ventana actual"""
+        if not self.cliente or not self.limite_cliente:
+            return
+        self.guardar()
+        with _lock:
+            inicio, usados = _consumo_clientes.get(self.cliente, (time.time(), 0))
+        if usados >= self.limite_cliente:
+            metricas.PRESUPUESTO_EXCEDIDO.labels(ALCANCE_CLIENTE).inc()
+            raise PresupuestoAgotado(max(1, int(inicio + PRESUPUESTO_VENTANA - time.time())))
+
+    def guardar(self):
+        """
+        Suma al archivo compartido lo que el cliente escaneó en este worker desde el último guardado
+        y actualiza el consumo en memoria con el de todos los workers. Bloquea el archivo del
+        cliente, así que no se llama desde el hilo del gestor de consultas.
+        """
+        if not self.cliente or not self.limite_cliente:
+            return
+        with _lock:
+            pendientes = _pendientes.pop(self.cliente, 0)
+        try:
+            with _ventana_cliente(self.cliente) as entrada:
+                entrada[1] += pendientes
+                inicio, usados = entrada
+        except OSError as e:
+            print(f"No se pudo guardar el presupuesto del cliente: {e}")
+            with _lock:
+                _pendientes[self.cliente] = _pendientes.get(self.cliente, 0) + pendientes
+            return
+        with _lock:
+            if len(_consumo_clientes) > PRESUPUESTO_MAX_CLIENTES:
+                _depurar_memoria(time.time())
+            # Lo escaneado mientras se guardaba sigue pendiente y cuenta en memoria
+            _consumo_clientes[self.cliente] = [inicio, usados + _pendientes.get(self.cliente, 0)]
+
+    def consumir(self, delta):
+        """
+        Suma bytes escaneados; retorna False si con ellos se supera algún presupuesto.
+        Lo llama el hilo del gestor en cada poll: solo actualiza memoria (ver guardar).
+        """
+        if delta <= 0:
+            return self.excedido is None
+        with self._lock:
+            self.usados += delta
+            if self.excedido is None and self.limite and self.usados > self.limite:
+                self.excedido = ALCANCE_PETICION
+        if self.cliente and self.limite_cliente:
+            with _lock:
+                entrada = _consumo_clientes.get(self.cliente)
+                if entrada is None:
+                    entrada = _consumo_clientes[self.cliente] = [time.time(), 0]
+                entrada[1] += delta
+                _pendientes[self.cliente] = _pendientes.get(self.cliente, 0) + delta
+                cliente_excedido = entrada[1] > self.limite_cliente
+            with self._lock:
+                if self.excedido is None and cliente_excedido:
+                    self.excedido = ALCANCE_CLIENTE
+        return self.excedido is None
+
+    def registrar_exceso(self):
+        """Cuenta en las métricas la petición detenida por presupuesto"""
+        if self.excedido is not None:
+            metricas.PRESUPUESTO_EXCEDIDO.labels(self.excedido).inc()
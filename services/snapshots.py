@@ -0,0 +1,87 @@
+import base64
+import binascii
+import json
+import os
+import time
+import uuid
+from services import cache
+
+SNAPSHOT_TTL = int(os.environ.get("SNAPSHOT_TTL", "900"))
+SNAPSHOT_MAX = int(os.environ.get("SNAPSHOT_MAX", "64"))
+SNAPSHOT_MAX_BYTES = int(os.environ.get("SNAPSHOT_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Resultados crudos de una búsqueda, para servir sus páginas sin repetir la consulta
+_snapshots = cache.TTLCache(
+    SNAPSHOT_MAX,
+    SNAPSHOT_TTL,
+    nombre="snapshots",
+    max_bytes=SNAPSHOT_MAX_BYTES,
+    sizeof=lambda snapshot: cache.tamano_resultado_insights({"results": snapshot["filas"]}),
+)
+
+
+def crear_snapshot(filas, huella, truncado=False, parcial=False, estadisticas=None, presupuesto_excedido=False):
+    """
+    Guarda las filas crudas de una búsqueda.
+
+    Parameters
+    ----------
+    filas : list
+        Filas retornadas por CloudWatch Logs Insights.
+    huella : tuple
+        Identifica los filtros con los que se obtuvieron las filas.
+    truncado : bool
+        Indica que la consulta no alcanzó a traer todos los registros del rango.
+    parcial : bool
+        Indica que alguna consulta no terminó (venció el tiempo), por lo que repetirla
+        podría traer otras filas.
+    estadisticas : dict
+        "statistics" de Logs Insights (recordsMatched, recordsScanned, bytesScanned).
+    presupuesto_excedido : bool
+        Indica que la consulta se detuvo por el presupuesto de bytes escaneados.
+
+    Returns
+    -------
+    dict
+        Snapshot con id, filas, huella, truncado, parcial, estadísticas, presupuesto_excedido
+        y fecha de expiración (epoch).
+    """
+    snapshot = {
+        "id": uuid.uuid4().hex,
+        "filas": filas,
+        "huella": huella,
+        "truncado": truncado,
+        "parcial": parcial or presupuesto_excedido,
+        "estadisticas": estadisticas or {},
+        "presupuesto_excedido": presupuesto_excedido,
+        "expira": int(time.time()) + SNAPSHOT_TTL,
+    }
+    _snapshots.set(snapshot["id"], snapshot)
+    return snapshot
+
+
+def obtener_snapshot(snapshot_id, huella):
+    """
+    Retorna el snapshot vigente o None si expiró o fue desalojado.
+    Lanza ValueError si el snapshot pertenece a una búsqueda con otros filtros.
+    """
+    snapshot = _snapshots.get(snapshot_id)
+    if snapshot is not None and snapshot["huella"] != huella:
+        raise ValueError("El cursor no corresponde a los filtros de la búsqueda")
+    return snapshot
+
+
+def codificar_cursor(snapshot_id, pagina):
+    """Cursor opaco para solicitar la página `pagina` de un snapshot"""
+    contenido = json.dumps({"s": snapshot_id, "p": pagina}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(contenido.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor):
+    """Retorna (snapshot_id, pagina) del cursor; lanza ValueError si el cursor es inválido"""
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        contenido = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return str(contenido["s"]), max(1, int(contenido["p"]))
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise ValueError("Cursor de paginación inválido")
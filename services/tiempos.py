@@ -0,0 +1,97 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Registro de la petición en curso; None fuera de una petición (hilos de pools, scripts)
+_registro = contextvars.ContextVar("tiempos", default=None)
+
+
+class Registro:
+    """Duración acumulada de cada etapa de una petición, en el orden en que aparecen, y contadores"""
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas = {}
+        self.contadores = {}
+        self._lock = threading.Lock()
+
+    def agregar(self, nombre, segundos, descripcion=None):
+        with self._lock:
+            acumulado, anterior = self.etapas.get(nombre, (0.0, None))
+            self.etapas[nombre] = (acumulado + segundos, descripcion or anterior)
+
+    def contar(self, nombre, cantidad=1):
+        with self._lock:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + cantidad
+
+    def encabezado(self):
+        """Valor de la cabecera Server-Timing (duraciones en milisegundos) más el total de la petición"""
+        with self._lock:
+            etapas = list(self.etapas.items())
+            contadores = list(self.contadores.items())
+        partes = []
+        for nombre, (segundos, descripcion) in etapas:
+            parte = f"{nombre};dur={segundos * 1000:.1f}"
+            if descripcion:
+                parte += ';desc="' + str(descripcion).replace('"', "'") + '"'
+            partes.append(parte)
+        partes.extend(f'{nombre};desc="{cantidad}"' for nombre, cantidad in contadores)
+        partes.append(f"total;dur={(time.perf_counter() - self.inicio) * 1000:.1f}")
+        return ", ".join(partes)
+
+
+def iniciar():
+    """Crea el registro de la petición actual"""
+    registro = Registro()
+    _registro.set(registro)
+    return registro
+
+
+def actual():
+    return _registro.get()
+
+
+def limpiar():
+    _registro.set(None)
+
+
+@contextmanager
+def continuar(registro):
+    """
+    Registra en `registro` las etapas del bloque. Los generadores de respuestas en streaming se
+    recorren después de que termina la petición (y de limpiar), así que lo reciben explícitamente.
+    """
+    if registro is None:
+        yield
+        return
+    _registro.set(registro)
+    try:
+        yield
+    finally:
+        _registro.set(None)
+
+
+def agregar(nombre, segundos, descripcion=None):
+    registro = _registro.get()
+    if registro is not None:
+        registro.agregar(nombre, segundos, descripcion)
+
+
+def contar(nombre, cantidad=1):
+    registro = _registro.get()
+    if registro is not None:
+        registro.contar(nombre, cantidad)
+
+
+@contextmanager
+def etapa(nombre, descripcion=None):
+    """Mide el bloque y lo suma a la etapa `nombre` de la petición actual, si la hay"""
+    registro = _registro.get()
+    if registro is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registro.agregar(nombre, time.perf_counter() - inicio, descripcion)
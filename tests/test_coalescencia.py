@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from services import coalescencia, gestorConsultas
+
+
+def esperar_union(vuelos, union, timeout=5):
+    """Lanza un hilo que llama a vuelos.ejecutar y espera a que se una a la ejecución en curso"""
+    resultado = {}
+
+    def llamar():
+        try:
+            resultado["valor"] = vuelos.ejecutar("llave", lambda: "propio", verificar=union.set)
+        except BaseException as e:
+            resultado["error"] = e
+
+    hilo = threading.Thread(target=llamar)
+    hilo.start()
+    assert union.wait(timeout)
+    return hilo, resultado
+
+
+def test_quien_espera_comparte_el_resultado_del_lider():
+    vuelos = coalescencia.Vuelos("prueba")
+    union = threading.Event()
+    esperado = {}
+
+    def lider():
+        # El segundo llamador llega mientras la ejecución del líder sigue en curso
+        esperado["hilo"], esperado["resultado"] = esperar_union(vuelos, union)
+        return "lider"
+
+    assert vuelos.ejecutar("llave", lider) == "lider"
+    esperado["hilo"].join(5)
+    assert esperado["resultado"] == {"valor": "lider"}
+    assert vuelos.en_curso() == 0
+
+
+def test_reintenta_si_el_lider_se_cancela():
+    vuelos = coalescencia.Vuelos("prueba", reintentables=(gestorConsultas.ConsultaCancelada,))
+    union = threading.Event()
+    esperado = {}
+
+    def lider():
+        esperado["hilo"], esperado["resultado"] = esperar_union(vuelos, union)
+        raise gestorConsultas.ConsultaCancelada(gestorConsultas.MOTIVO_DESCONEXION)
+
+    with pytest.raises(gestorConsultas.ConsultaCancelada):
+        vuelos.ejecutar("llave", lider)
+    esperado["hilo"].join(5)
+    # La cancelación era del líder: quien esperaba ejecuta su propia función
+    assert esperado["resultado"] == {"valor": "propio"}
+
+
+def test_propaga_excepciones_no_reintentables():
+    vuelos = coalescencia.Vuelos("prueba", reintentables=(gestorConsultas.ConsultaCancelada,))
+    union = threading.Event()
+    esperado = {}
+
+    def lider():
+        esperado["hilo"], esperado["resultado"] = esperar_union(vuelos, union)
+        raise RuntimeError("fallo de CloudWatch")
+
+    with pytest.raises(RuntimeError):
+        vuelos.ejecutar("llave", lider)
+    esperado["hilo"].join(5)
+    assert isinstance(esperado["resultado"]["error"], RuntimeError)
+
+
+def test_quien_espera_se_cancela_al_desconectarse(monkeypatch):
+    monkeypatch.setattr(gestorConsultas, "INTERVALO_DESCONEXION", 0.01)
+    vuelos = coalescencia.Vuelos("prueba")
+    liberar = threading.Event()
+    en_curso = threading.Event()
+
+    def lider():
+        en_curso.set()
+        liberar.wait(5)
+        return "lider"
+
+    hilo = threading.Thread(target=vuelos.ejecutar, args=("llave", lider))
+    hilo.start()
+    assert en_curso.wait(5)
+    inicio = time.monotonic()
+    with pytest.raises(gestorConsultas.ConsultaCancelada):
+        vuelos.ejecutar("llave", lambda: "propio", desconectado=lambda: True)
+    assert time.monotonic() - inicio < 2
+    liberar.set()
+    hilo.join(5)
@@ -0,0 +1,48 @@
+from services import consultaParticionada
+
+
+def fila(timestamp, mensaje, ptr=None):
+    campos = [{"field": "@timestamp", "value": timestamp}, {"field": "@message", "value": mensaje}]
+    if ptr is not None:
+        campos.append({"field": "@ptr", "value": ptr})
+    return campos
+
+
+def test_fusionar_resultados_ordena_por_timestamp_descendente():
+    listas = [
+        [fila("2024-01-01 10:00:05.000", "a"), fila("2024-01-01 10:00:01.000", "b")],
+        [fila("2024-01-01 10:00:04.000", "c"), fila("2024-01-01 10:00:02.000", "d")],
+        [fila("2024-01-01 10:00:03.000", "e")],
+    ]
+    mensajes = [f[1]["value"] for f in consultaParticionada.fusionar_resultados(listas)]
+    assert mensajes == ["a", "c", "e", "d", "b"]
+
+
+def test_fusionar_resultados_descarta_filas_del_borde_compartido():
+    # Dos subventanas que comparten el segundo de borde retornan la misma fila
+    borde = fila("2024-01-01 10:00:02.000", "borde", ptr="p2")
+    listas = [
+        [fila("2024-01-01 10:00:03.000", "x", ptr="p3"), borde],
+        [list(borde), fila("2024-01-01 10:00:01.000", "y", ptr="p1")],
+    ]
+    filas = list(consultaParticionada.fusionar_resultados(listas))
+    assert [f[2]["value"] for f in filas] == ["p3", "p2", "p1"]
+
+
+def test_fusionar_resultados_sin_ptr_usa_timestamp_y_mensaje():
+    listas = [
+        [fila("2024-01-01 10:00:02.000", "igual"), fila("2024-01-01 10:00:02.000", "otro")],
+        [fila("2024-01-01 10:00:02.000", "igual")],
+    ]
+    filas = list(consultaParticionada.fusionar_resultados(listas))
+    assert sorted(f[1]["value"] for f in filas) == ["igual", "otro"]
+
+
+def test_planificador_parte_la_ventana_que_alcanza_el_limite():
+    planificador = consultaParticionada._Planificador(0, 100, limite=10)
+    ventana = planificador.siguiente_ventana()
+    assert ventana == (0, 100)
+    assert planificador.registrar(ventana, 10) is False
+    assert planificador.siguiente_ventana() == (0, 50)
+    assert planificador.siguiente_ventana() == (50, 100)
+    assert planificador.siguiente_ventana() is None
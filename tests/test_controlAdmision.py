@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from services import controlAdmision, gestorConsultas
+
+
+@pytest.fixture
+def control(tmp_path, monkeypatch):
+    monkeypatch.setattr(controlAdmision, "ADMISION_INTERVALO", 0.01)
+    monkeypatch.setattr(controlAdmision, "ADMISION_ESPERA_MAXIMA", 0.2)
+    return controlAdmision.ControlAdmision(limite=1, directorio=str(tmp_path))
+
+
+def test_sin_cupo_rechaza_al_vencer_la_espera(control):
+    with control.turno("a"):
+        with pytest.raises(controlAdmision.AdmisionRechazada):
+            with control.turno("b"):
+                pass
+    assert control.en_cola() == 0
+    # Al liberarse el cupo se puede volver a tomar
+    with control.turno("b"):
+        pass
+
+
+def test_cupos_compartidos_entre_instancias(control, tmp_path):
+    # Otra instancia con el mismo directorio representa a otro worker del host
+    otro_worker = controlAdmision.ControlAdmision(limite=1, directorio=str(tmp_path))
+    with control.turno("a"):
+        # flock bloquea por descriptor abierto, así que también se excluyen dentro del mismo proceso
+        assert otro_worker._tomar_cupo() is None
+    assert otro_worker._tomar_cupo() == 0
+
+
+def test_cola_llena(control, monkeypatch):
+    monkeypatch.setattr(controlAdmision, "ADMISION_MAX_COLA", 0)
+    with pytest.raises(controlAdmision.AdmisionRechazada):
+        with control.turno("a"):
+            pass
+
+
+def test_turnos_entre_claves(control, monkeypatch):
+    monkeypatch.setattr(controlAdmision, "ADMISION_ESPERA_MAXIMA", 5)
+    orden = []
+    hilos = []
+
+    def consultar(clave):
+        with control.turno(clave):
+            orden.append(clave)
+
+    with control.turno("ocupado"):
+        # "a" encola dos consultas antes que "b"; con turnos, "b" no espera a que terminen ambas
+        for clave in ("a", "a", "b"):
+            hilo = threading.Thread(target=consultar, args=(clave,))
+            hilo.start()
+            hilos.append(hilo)
+            while control.en_cola() < len(hilos):
+                time.sleep(0.01)
+    for hilo in hilos:
+        hilo.join(5)
+    assert orden == ["a", "b", "a"]
+
+
+def test_desconexion_mientras_espera(control):
+    with control.turno("a"):
+        with pytest.raises(gestorConsultas.ConsultaCancelada):
+            with control.turno("b", desconectado=lambda: True):
+                pass
+    assert control.en_cola() == 0
@@ -0,0 +1,70 @@
+import pytest
+
+from benchmarks.fake_logs import FakeLogsClient
+from services import gestorConsultas
+
+TIMEOUT = 5
+
+
+@pytest.fixture
+def gestor(monkeypatch):
+    monkeypatch.setattr(gestorConsultas, "POLL_INICIAL", 0.01)
+    return gestorConsultas.GestorConsultas()
+
+
+class ClienteRoto:
+    """Cliente de CloudWatch cuyas llamadas fallan"""
+    def __init__(self):
+        self.detenidas = []
+
+    def get_query_results(self, queryId):
+        raise RuntimeError("get_query_results falló")
+
+    def stop_query(self, queryId):
+        self.detenidas.append(queryId)
+        raise RuntimeError("stop_query falló")
+
+
+def consultar(gestor, client, **kwargs):
+    query_id = client.start_query("grupo", client.inicio, client.fin, "fields @message | limit 10")["queryId"]
+    return gestor.resultado(query_id, gestor.esperar(client, query_id, TIMEOUT, **kwargs))
+
+
+def test_resultado_de_una_consulta(gestor):
+    client = FakeLogsClient(cantidad=50, duracion=0.05)
+    resultado = consultar(gestor, client)
+    assert resultado["status"] == "Complete"
+    assert len(resultado["results"]) == 10
+    assert resultado["seguimiento"]["polls"] >= 1
+    assert gestor.en_curso() == 0
+
+
+def test_error_del_cliente_no_detiene_el_hilo(gestor):
+    client = ClienteRoto()
+    futuro = gestor.esperar(client, "rota", TIMEOUT)
+    with pytest.raises(RuntimeError):
+        gestor.resultado("rota", futuro)
+    assert client.detenidas == ["rota"]
+    assert gestor._hilo.is_alive()
+    assert consultar(gestor, FakeLogsClient(cantidad=50))["status"] == "Complete"
+
+
+def test_error_inesperado_al_atender_no_detiene_el_hilo(gestor):
+    def terminada(result):
+        raise ValueError("terminada falló")
+
+    with pytest.raises(ValueError):
+        consultar(gestor, FakeLogsClient(cantidad=50), terminada=terminada)
+    assert gestor.en_curso() == 0
+    assert gestor._hilo.is_alive()
+    assert consultar(gestor, FakeLogsClient(cantidad=50))["status"] == "Complete"
+
+
+def test_cancelar_detiene_la_consulta(gestor):
+    client = FakeLogsClient(cantidad=50, duracion=60)
+    query_id = client.start_query("grupo", client.inicio, client.fin, "fields @message")["queryId"]
+    futuro = gestor.esperar(client, query_id, TIMEOUT)
+    gestor.cancelar(query_id, gestorConsultas.MOTIVO_DESCONEXION)
+    with pytest.raises(gestorConsultas.ConsultaCancelada):
+        gestor.resultado(query_id, futuro)
+    assert client.consultas_activas() == 0
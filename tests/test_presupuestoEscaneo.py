@@ -0,0 +1,50 @@
+import pytest
+
+from services import presupuestoEscaneo
+
+
+@pytest.fixture(autouse=True)
+def directorio(tmp_path, monkeypatch):
+    monkeypatch.setattr(presupuestoEscaneo, "PRESUPUESTO_DIR", str(tmp_path))
+    presupuestoEscaneo._consumo_clientes.clear()
+    presupuestoEscaneo._pendientes.clear()
+    yield tmp_path
+    presupuestoEscaneo._consumo_clientes.clear()
+    presupuestoEscaneo._pendientes.clear()
+
+
+def test_presupuesto_de_peticion_excedido():
+    presupuesto = presupuestoEscaneo.Presupuesto(limite=100, limite_cliente=0)
+    assert presupuesto.consumir(60) is True
+    assert presupuesto.consumir(60) is False
+    assert presupuesto.excedido == presupuestoEscaneo.ALCANCE_PETICION
+
+
+def test_cliente_con_presupuesto_agotado():
+    presupuesto = presupuestoEscaneo.Presupuesto("cliente", limite=0, limite_cliente=100)
+    presupuesto.verificar()
+    assert presupuesto.consumir(150) is False
+    assert presupuesto.excedido == presupuestoEscaneo.ALCANCE_CLIENTE
+    presupuesto.guardar()
+
+    with pytest.raises(presupuestoEscaneo.PresupuestoAgotado) as error:
+        presupuestoEscaneo.Presupuesto("cliente", limite=0, limite_cliente=100).verificar()
+    assert 1 <= error.value.reintentar <= presupuestoEscaneo.PRESUPUESTO_VENTANA
+    # Los demás clientes conservan su presupuesto
+    presupuestoEscaneo.Presupuesto("otro", limite=0, limite_cliente=100).verificar()
+
+
+def test_consumo_compartido_entre_workers():
+    presupuestoEscaneo.Presupuesto("cliente", limite=0, limite_cliente=100).consumir(150)
+    presupuestoEscaneo.Presupuesto("cliente", limite=0, limite_cliente=100).guardar()
+    # Otro worker no tiene el consumo en memoria: lo lee del archivo del cliente
+    presupuestoEscaneo._consumo_clientes.clear()
+    with pytest.raises(presupuestoEscaneo.PresupuestoAgotado):
+        presupuestoEscaneo.Presupuesto("cliente", limite=0, limite_cliente=100).verificar()
+
+
+def test_la_ventana_terminada_reinicia_el_consumo(monkeypatch):
+    presupuestoEscaneo.Presupuesto("cliente", limite=0, limite_cliente=100).consumir(150)
+    presupuestoEscaneo.Presupuesto("cliente", limite=0, limite_cliente=100).guardar()
+    monkeypatch.setattr(presupuestoEscaneo, "PRESUPUESTO_VENTANA", 0)
+    presupuestoEscaneo.Presupuesto("cliente", limite=0, limite_cliente=100).verificar()
@@ -0,0 +1,27 @@
+import pytest
+
+from services import snapshots
+
+FILAS = [[{"field": "@message", "value": "evento"}]]
+
+
+def test_obtener_snapshot_con_la_misma_huella():
+    snapshot = snapshots.crear_snapshot(FILAS, ("grupo", "filtro"))
+    assert snapshots.obtener_snapshot(snapshot["id"], ("grupo", "filtro")) is snapshot
+
+
+def test_obtener_snapshot_con_otra_huella():
+    snapshot = snapshots.crear_snapshot(FILAS, ("grupo", "filtro"))
+    with pytest.raises(ValueError):
+        snapshots.obtener_snapshot(snapshot["id"], ("grupo", "otro filtro"))
+
+
+def test_obtener_snapshot_inexistente():
+    assert snapshots.obtener_snapshot("no-existe", ("grupo", "filtro")) is None
+
+
+def test_cursor():
+    cursor = snapshots.codificar_cursor("abc", 3)
+    assert snapshots.decodificar_cursor(cursor) == ("abc", 3)
+    with pytest.raises(ValueError):
+        snapshots.decodificar_cursor("no es un cursor")